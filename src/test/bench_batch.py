@@ -0,0 +1,92 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from protocol import parse_cells
+from simulator import World, test_cases
+from simulator.batch import ACTIONS, BatchWorld, encode
+
+# steps of the batched simulator per second, every test case's map stacked many times over and played with
+# random actions, with and without what the players see every turn:
+#   python bench_batch.py [--games N] [--steps N] [--check N]
+# --check first plays N random games per map on World and BatchWorld side by side and stops at the first
+# turn they disagree on, position, outcome or any visible cell as the bot would parse it.
+
+# moves mostly, so the players get around the map
+WEIGHTS = np.array([1, 4, 4, 4, 4, 2, 0.1])
+
+
+def check(spec, turns, seed):
+    rng = random.Random(seed)
+    world = World(spec)
+    batch = BatchWorld([spec], turn_limits=[turns])
+    r = batch.vision
+    for turn in range(turns):
+        action = rng.choices(ACTIONS, weights=WEIGHTS)[0]
+        world.step(action)
+        won = world.won()
+        world.after_turn()
+        batch.step(encode([action]))
+        if (world.x, world.y, won, world.deaths, world.resets) != \
+                (batch.x[0], batch.y[0], batch.won[0], batch.deaths[0], batch.resets[0]):
+            return f'turn {turn + 1} {action}: world at {world.x},{world.y} won={won} deaths={world.deaths}, ' \
+                   f'batch at {batch.x[0]},{batch.y[0]} won={batch.won[0]} deaths={batch.deaths[0]}'
+        if won:
+            return None
+        obs = parse_cells([line.encode() for line in world.observation()], world.x, world.y)
+        visible, groups, wins, levers = batch.view()
+        seen = {(int(x) - r + world.x, int(y) - r + world.y) for y, x in zip(*np.nonzero(visible[0]))}
+        if seen != obs.visible:
+            return f'turn {turn + 1}: world sees {sorted(obs.visible ^ seen)} differently'
+        for i in range(len(obs)):
+            wy = obs.ys[i] - world.y + r
+            wx = obs.xs[i] - world.x + r
+            cell = (obs.groups[i], obs.interactive[i], obs.wins[i])
+            if cell != (groups[0, wy, wx], levers[0, wy, wx], wins[0, wy, wx]):
+                return f'turn {turn + 1}: cell {obs.xs[i]},{obs.ys[i]} is {cell} in world, ' \
+                       f'{(groups[0, wy, wx], levers[0, wy, wx], wins[0, wy, wx])} in batch'
+    return None
+
+
+def run(batch, steps, view, rng):
+    probabilities = WEIGHTS / WEIGHTS.sum()
+    actions = rng.choice(len(ACTIONS), size=(steps, batch.n), p=probabilities).astype(np.int8)
+    start = time.perf_counter()
+    for step in range(steps):
+        batch.step(actions[step])
+        if view:
+            batch.view()
+        if batch.done().any():
+            batch.restart(batch.done())
+    return batch.n * steps / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_batch.py')
+    parser.add_argument('--games', type=int, default=4096)
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--check', type=int, default=0)
+    args = parser.parse_args()
+
+    specs = [case.spec() for case in test_cases()]
+    if args.check:
+        for spec in specs:
+            for seed in range(args.check):
+                problem = check(spec, 500, seed)
+                if problem:
+                    print(f'{spec.name} seed {seed}: {problem}')
+                    return 1
+        print(f'{len(specs) * args.check} games agree')
+
+    rng = np.random.default_rng(0)
+    batch = BatchWorld([specs[i % len(specs)] for i in range(args.games)])
+    print(f"{'games':>6} {'steps/s':>10} {'with view':>10}")
+    print(f'{args.games:6} {run(batch, args.steps, False, rng):10.0f} {run(batch, args.steps, True, rng):10.0f}')
+    print(f'{len(batch.masks)} vision patterns')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,149 @@
+import argparse
+import random
+import time
+
+from bot import Bot
+from connectivity import Components
+from grid import iter_bits, neighbours
+from model import GroupProps
+from queries import MODES
+
+# reveals random boards a few cells a turn, now and then walls a floor cell off or flips what a group is known
+# to do, and times the union-find each traversal mode keeps (Connectivity) against building one from
+# nothing:
+#   python bench_connectivity.py [--turns N] [--check N]
+# --check first plays N boards per size and stops at the first turn where a mode's components or a
+# reachability answer differ from a breadth-first search.
+
+# groups besides floor and wall, their 'unpassable' and 'kills' flipping between known and unknown
+GROUPS = (2, 3, 4)
+STATES = (-1, True, False)
+
+
+def make_bot(size):
+    bot = Bot(size, size, 0, 0, 4, 600)
+    for gid in GROUPS:
+        bot.groups[gid] = GroupProps()
+    return bot
+
+
+def change(bot, rng, cells=6):
+    board = bot.board
+    fog = list(iter_bits(board.members(-1)))
+    for idx in rng.sample(fog, min(cells, len(fog))):
+        board.set(idx, rng.choice((0, 0, 0, 1) + GROUPS))
+    if rng.random() < 0.2 and board.members(0):
+        board.set(rng.choice(list(iter_bits(board.members(0)))), 1)
+    bot.touch_board()
+    if rng.random() < 0.3:
+        group = bot.groups[rng.choice(GROUPS)]
+        group[rng.choice(('unpassable', 'kills'))] = rng.choice(STATES)
+        bot.groups_version = next(bot.versions)
+
+
+def walkable(bot, mode):
+    passable, _ = bot.traversal(*MODES[mode])
+    cells = bot.board.cells
+    mask = 0
+    for idx in range(bot.board.size):
+        if passable.get(cells[idx]):
+            mask |= 1 << idx
+    return mask
+
+
+def flood(board, mask):
+    # the connected parts of mask, by breadth-first search
+    around = neighbours(board.width, board.height)
+    parts = []
+    left = mask
+    while left:
+        low = left & -left
+        part = low
+        todo = [low.bit_length() - 1]
+        while todo:
+            idx = todo.pop()
+            for tidx, _ in around[idx]:
+                bit = 1 << tidx
+                if mask & bit and not part & bit:
+                    part |= bit
+                    todo.append(tidx)
+        parts.append(part)
+        left &= ~part
+    return parts
+
+
+def check(size, turns, seed, pairs=20):
+    rng = random.Random(seed)
+    bot = make_bot(size)
+    board = bot.board
+    around = neighbours(board.width, board.height)
+    for turn in range(turns):
+        change(bot, rng)
+        for mode in MODES:
+            components = bot.connectivity.components(mode)
+            mask = walkable(bot, mode)
+            if components.mask != mask:
+                return f'turn {turn + 1} mode {mode}: walkable cells differ'
+            parts = flood(board, mask)
+            roots = set()
+            for part in parts:
+                root = {components.find(idx) for idx in iter_bits(part)}
+                if len(root) != 1 or root & roots:
+                    return f'turn {turn + 1} mode {mode}: {len(parts)} parts, union-find disagrees'
+                roots |= root
+            part_of = {idx: part for part in parts for idx in iter_bits(part)}
+            for _ in range(pairs):
+                start = rng.randrange(board.size)
+                goal = rng.randrange(board.size)
+                expected = start == goal or goal in part_of and \
+                    any(tidx in part_of and part_of[tidx] is part_of[goal] for tidx, _ in around[start])
+                if components.reachable(start, goal) != expected:
+                    return f'turn {turn + 1} mode {mode}: {board.coords(start)} to {board.coords(goal)} ' \
+                           f'reachable={not expected}, not {expected}'
+        if not board.members(-1):
+            return None
+    return None
+
+
+def walk(size, turns, seed):
+    rng = random.Random(seed)
+    bot = make_bot(size)
+    kept = 0.0
+    built = 0.0
+    for _ in range(turns):
+        change(bot, rng)
+        for mode in MODES:
+            start = time.perf_counter()
+            components = bot.connectivity.components(mode)
+            kept += time.perf_counter() - start
+            start = time.perf_counter()
+            Components(bot.board, components.mask)
+            built += time.perf_counter() - start
+    return kept * 1e6 / turns, built * 1e6 / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_connectivity.py')
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--check', type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = (20, 32, 50)
+    if args.check:
+        for size in sizes:
+            for seed in range(args.check):
+                problem = check(size, args.turns, seed)
+                if problem:
+                    print(f'{size}x{size} seed {seed}: {problem}')
+                    return 1
+        print(f'{len(sizes) * args.check} boards agree')
+
+    print(f"{'board':>8} {'kept us':>9} {'built us':>9} {'speedup':>8}")
+    for size in sizes:
+        kept_us, built_us = walk(size, args.turns, 0)
+        print(f'{size:>4}x{size:<3} {kept_us:9.1f} {built_us:9.1f} {built_us / kept_us:7.2f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
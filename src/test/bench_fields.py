@@ -0,0 +1,127 @@
+import argparse
+import random
+import time
+
+from bot import Bot
+from fields import INFINITE, DistanceField
+from grid import iter_bits
+from queries import FOG, TurnQueries, risk_costs, risky_groups
+
+# walks the player to the far corner of random boards with fog, revealing a few cells around it every turn,
+# and times the distance field it asks each turn when fields are rebuilt and when they are repaired:
+#   python bench_fields.py [--turns N] [--check N]
+# --check first walks N boards per size with repairs and stops at the first turn a repaired field answers
+# differently from one built from nothing, for the corner and for the frontier, from the player's cell and
+# from a few others.
+
+MOVES = {'LEFT': (-1, 0), 'RIGHT': (1, 0), 'UP': (0, -1), 'DOWN': (0, 1)}
+
+
+def make_bot(size, walls, fog, rng):
+    bot = Bot(size, size, 0, 0, 4, 600)
+    board = bot.board
+    for idx in range(board.size):
+        roll = rng.random()
+        if idx in (0, 1, size, board.size - 1):
+            board.set(idx, 0)
+        else:
+            board.set(idx, 1 if roll < walls else -1 if roll > 1 - fog else 0)
+    bot.touch_board()
+    return bot
+
+
+def reveal(bot, rng, cells=3, radius=4):
+    board = bot.board
+    for _ in range(cells):
+        x = min(board.width - 1, max(0, bot.cx + rng.randint(-radius, radius)))
+        y = min(board.height - 1, max(0, bot.cy + rng.randint(-radius, radius)))
+        idx = board.index(x, y)
+        if board.cells[idx] == -1:
+            board.set(idx, 0 if rng.random() < 0.8 else 1)
+            bot.touch_board()
+
+
+def walk(size, repair, turns, seed):
+    rng = random.Random(seed)
+    bot = make_bot(size, 0.2, 0.15, rng)
+    goal = [(size - 1, size - 1)]
+    seconds = 0.0
+    nodes = 0
+    if not repair:
+        bot.fields.repair_min = INFINITE
+    for turn in range(turns):
+        reveal(bot, rng)
+        before = bot.metrics.nodes
+        start = time.perf_counter()
+        ln, dir, _, _ = TurnQueries(bot).nearest_goal(goal, FOG)
+        seconds += time.perf_counter() - start
+        nodes += bot.metrics.nodes - before
+        if ln <= 0:
+            return seconds * 1e6 / (turn + 1), nodes / (turn + 1)
+        dx, dy = MOVES[dir]
+        bot.change_position(bot.cx + dx, bot.cy + dy)
+    return seconds * 1e6 / turns, nodes / turns
+
+
+def fresh(bot, field, goals, costs):
+    return DistanceField(bot.board, goals, costs, risky_groups(bot.groups), bot.metrics, field.charge_goal,
+                         field.ordered)
+
+
+def check(size, turns, seed, starts=8):
+    rng = random.Random(seed)
+    bot = make_bot(size, 0.2, 0.15, rng)
+    board = bot.board
+    corner = [board.index(size - 1, size - 1)]
+    unit = board.size + 1
+    for turn in range(turns):
+        reveal(bot, rng)
+        queries = TurnQueries(bot)
+        frontier = list(iter_bits(bot.frontier.sync()))
+        fields = [('corner', queries.field(FOG, corner, lambda: queries.mode_costs(FOG)), corner,
+                   queries.mode_costs(FOG))]
+        if frontier:
+            fields.append(('frontier', queries.risk_field(frontier, charge_goal=False, ordered=False), frontier,
+                           risk_costs(bot.groups, unit, FOG)))
+        cells = [queries.start] + [rng.randrange(board.size) for _ in range(starts)]
+        for name, field, goals, costs in fields:
+            rebuilt = fresh(bot, field, goals, costs)
+            for idx in cells:
+                if field.answer(idx) != rebuilt.answer(idx):
+                    return f'turn {turn + 1}: {name} from {board.coords(idx)} is {field.answer(idx)} repaired, ' \
+                           f'{rebuilt.answer(idx)} rebuilt'
+        ln, dir, _, _ = fields[0][1].answer(queries.start)
+        if ln <= 0:
+            return None
+        dx, dy = MOVES[dir]
+        bot.change_position(bot.cx + dx, bot.cy + dy)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_fields.py')
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--check', type=int, default=0)
+    args = parser.parse_args()
+    turns = args.turns
+
+    if args.check:
+        for size in (20, 32, 50):
+            for seed in range(args.check):
+                problem = check(size, turns, seed)
+                if problem:
+                    print(f'{size}x{size} seed {seed}: {problem}')
+                    return 1
+        print(f'{3 * args.check} walks agree')
+
+    print(f"{'board':>8} {'rebuild us':>11} {'nodes':>7} {'repair us':>10} {'nodes':>7} {'speedup':>8}")
+    for size in (20, 32, 50):
+        rebuild_us, rebuild_nodes = walk(size, False, turns, 0)
+        repair_us, repair_nodes = walk(size, True, turns, 0)
+        print(f"{size:>4}x{size:<3} {rebuild_us:11.1f} {rebuild_nodes:7.0f} {repair_us:10.1f} {repair_nodes:7.0f} "
+              f"{rebuild_us / repair_us:7.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
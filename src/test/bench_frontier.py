@@ -0,0 +1,125 @@
+import argparse
+import random
+import time
+
+from frontier import Frontier
+from grid import Grid, iter_bits
+
+# uncovers random boards around a point wandering over them, a few cells a step the way vision does, now
+# and then fogging a cell again, and times keeping the frontier and its clusters with Frontier.sync against
+# finding them again from nothing:
+#   python bench_frontier.py [--steps N] [--check N]
+# --check first uncovers N boards per size and stops at the first step whose frontier cells or clusters
+# differ from the brute-force ones.
+
+
+def brute(board):
+    # (frontier bitset, set of cluster bitsets) straight from the definition
+    width = board.width
+    height = board.height
+    fog = board.members(-1)
+    cells = 0
+    for idx in iter_bits(fog):
+        x, y = idx % width, idx // width
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if 0 <= nx < width and 0 <= ny < height and not fog >> (ny * width + nx) & 1:
+                cells |= 1 << idx
+                break
+    clusters = set()
+    left = cells
+    while left:
+        idx = (left & -left).bit_length() - 1
+        members = 1 << idx
+        todo = [idx]
+        while todo:
+            idx = todo.pop()
+            x, y = idx % width, idx // width
+            for ny in range(max(0, y - 1), min(height, y + 2)):
+                for nx in range(max(0, x - 1), min(width, x + 2)):
+                    bit = 1 << (ny * width + nx)
+                    if cells & bit and not members & bit:
+                        members |= bit
+                        todo.append(ny * width + nx)
+        clusters.add(members)
+        left &= ~members
+    return cells, clusters
+
+
+def uncover(board, rng, at, cells=6, radius=3):
+    # moves the point a step and uncovers cells around it; returns the new point
+    x = min(board.width - 1, max(0, at[0] + rng.randint(-1, 1)))
+    y = min(board.height - 1, max(0, at[1] + rng.randint(-1, 1)))
+    for _ in range(cells):
+        nx = min(board.width - 1, max(0, x + rng.randint(-radius, radius)))
+        ny = min(board.height - 1, max(0, y + rng.randint(-radius, radius)))
+        board.set(board.index(nx, ny), 0 if rng.random() < 0.8 else 1)
+    if rng.random() < 0.1:
+        board.set(rng.randrange(board.size), -1)
+    return x, y
+
+
+def check(size, steps, seed):
+    rng = random.Random(seed)
+    board = Grid(size, size)
+    frontier = Frontier(board)
+    at = (rng.randrange(size), rng.randrange(size))
+    for step in range(steps):
+        at = uncover(board, rng, at)
+        cells = frontier.sync()
+        expected, clusters = brute(board)
+        if cells != expected:
+            return f'step {step + 1}: cells {sorted(board.coords(idx) for idx in iter_bits(cells ^ expected))} ' \
+                   f'differ'
+        if set(frontier.clusters.values()) != clusters:
+            return f'step {step + 1}: {len(frontier.clusters)} clusters, {len(clusters)} expected'
+        for idx in iter_bits(cells):
+            if not frontier.cluster_of(idx) >> idx & 1:
+                return f'step {step + 1}: cell {board.coords(idx)} points at a cluster without it'
+        if not board.members(-1):
+            return None
+    return None
+
+
+def walk(size, steps, seed):
+    rng = random.Random(seed)
+    board = Grid(size, size)
+    frontier = Frontier(board)
+    at = (size // 2, size // 2)
+    synced = 0.0
+    rebuilt = 0.0
+    for _ in range(steps):
+        at = uncover(board, rng, at)
+        start = time.perf_counter()
+        frontier.sync()
+        synced += time.perf_counter() - start
+        start = time.perf_counter()
+        brute(board)
+        rebuilt += time.perf_counter() - start
+    return synced * 1e6 / steps, rebuilt * 1e6 / steps
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_frontier.py')
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--check', type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = (20, 32, 50)
+    if args.check:
+        for size in sizes:
+            for seed in range(args.check):
+                problem = check(size, args.steps, seed)
+                if problem:
+                    print(f'{size}x{size} seed {seed}: {problem}')
+                    return 1
+        print(f'{len(sizes) * args.check} boards agree')
+
+    print(f"{'board':>8} {'sync us':>9} {'rebuild us':>11} {'speedup':>8}")
+    for size in sizes:
+        synced_us, rebuilt_us = walk(size, args.steps, 0)
+        print(f'{size:>4}x{size:<3} {synced_us:9.1f} {rebuilt_us:11.1f} {rebuilt_us / synced_us:7.2f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
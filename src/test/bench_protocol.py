@@ -0,0 +1,137 @@
+import io
+import random
+import sys
+import time
+
+from protocol import Reader
+
+# micro-benchmark of the observation reader against the input() / string slicing loop it replaced,
+# on synthetic turns with the whole vision square visible:
+#   python bench_protocol.py [turns] [radius]
+
+
+def make_turn(rng, radius):
+    # walls, floors with an object on top, the odd flag and lever, several lines per cell like the referee
+    sx = sy = radius
+    lines = []
+    for y in range(2 * radius + 1):
+        for x in range(2 * radius + 1):
+            roll = rng.random()
+            if roll < 0.3:
+                lines.append(f"{x} {y} OBJECT_TYPE:1")
+            elif roll < 0.35:
+                lines.append(f"{x} {y} OBJECT_TYPE:0,INTERACT:{rng.choice(['?', '3', '7'])}")
+            elif roll < 0.4:
+                lines.append(f"{x} {y} OBJECT_TYPE:0")
+                lines.append(f"{x} {y} OBJECT_TYPE:5,WIN_POINT")
+            elif roll < 0.7:
+                lines.append(f"{x} {y} OBJECT_TYPE:0")
+                lines.append(f"{x} {y} OBJECT_TYPE:{rng.randint(2, 12)}")
+            else:
+                lines.append(f"{x} {y} OBJECT_TYPE:0")
+    return [f"{len(lines)} {sx} {sy}"] + lines
+
+
+def legacy_turn(input):
+    # the turn loop as it was, minus the Bot calls
+    cells, sx, sy = [int(i) for i in input().split()]
+    used_cells = {}
+    total_cells = []
+    prev_cx = None
+    prev_cy = None
+    chosen_group = -2
+    chosen_win = False
+    chosen_interactive = False
+    for i in range(cells):
+        buf = input().split(' ')
+        cx = int(buf[0])
+        cy = int(buf[1])
+        if prev_cx is not None and (cx != prev_cx or cy != prev_cy):
+            total_cells.append([prev_cx, prev_cy, chosen_group, chosen_interactive, chosen_win])
+            used_cells[(prev_cx, prev_cy)] = True
+            chosen_group = -2
+            chosen_win = False
+            chosen_interactive = False
+
+        props = str(buf[2])
+        group = -2
+        win = False
+        interactive = False
+        for prop in props.split(","):
+            if prop[0] == "O":
+                group = int(prop[12:])
+            if prop[0] == "W":
+                win = True
+            if prop[0] == "I":
+                if prop[9] == "?":
+                    interactive = True
+                else:
+                    interactive = int(prop[9:])
+        if interactive or group > chosen_group:
+            if interactive:
+                chosen_group = 9999
+            else:
+                chosen_group = group
+            chosen_win = win
+            chosen_interactive = interactive
+        prev_cx = cx
+        prev_cy = cy
+
+    total_cells.append([cx, cy, chosen_group, chosen_interactive, chosen_win])
+    used_cells[(cx, cy)] = True
+    return total_cells, used_cells
+
+
+def run_legacy(text, turns):
+    stream = io.StringIO(text)
+    readline = stream.readline
+
+    def input():
+        return readline().rstrip('\n')
+
+    input()
+    results = []
+    for _ in range(turns):
+        results.append(legacy_turn(input))
+    return results
+
+
+def run_reader(data, turns):
+    reader = Reader(io.BufferedReader(io.BytesIO(data)))
+    reader.read_header()
+    return [reader.read_turn() for _ in range(turns)]
+
+
+def same(legacy, observations):
+    for (total_cells, used_cells), obs in zip(legacy, observations):
+        records = [[x, y, group, True if interactive == -1 else (interactive or False), win == 1]
+                   for x, y, group, interactive, win in zip(obs.xs, obs.ys, obs.groups, obs.interactive, obs.wins)]
+        if records != total_cells or set(used_cells) != obs.visible:
+            return False
+    return True
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    radius = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    rng = random.Random(0)
+    lines = ["32 32 600"]
+    for _ in range(turns):
+        lines.extend(make_turn(rng, radius))
+    text = "\n".join(lines) + "\n"
+    data = text.encode()
+
+    start = time.perf_counter()
+    legacy = run_legacy(text, turns)
+    legacy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    observations = run_reader(data, turns)
+    reader_time = time.perf_counter() - start
+
+    print(f"turns: {turns}, lines per turn: {(len(lines) - 1) // turns - 1}, same records: {same(legacy, observations)}")
+    print(f"input() loop: {legacy_time * 1e6 / turns:8.1f} us/turn")
+    print(f"Reader:       {reader_time * 1e6 / turns:8.1f} us/turn ({legacy_time / reader_time:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
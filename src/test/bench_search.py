@@ -0,0 +1,66 @@
+import random
+import sys
+import time
+
+from bot import Bot
+from queries import BITBOARD, QUEUE, STRICT, TurnQueries
+
+# times the queue and bitboard search backends on random fully known boards up to the engine's 50x50:
+#   python bench_search.py [repeats]
+
+
+def make_bot(size, walls, rng):
+    bot = Bot(size, size, 0, 0, 4, 600)
+    board = bot.board
+    for idx in range(board.size):
+        board.set(idx, 1 if idx not in (0, 1, size) and rng.random() < walls else 0)
+    return bot
+
+
+def far_cell(bot):
+    # the reachable floor cell furthest from the player, so every search has to cover the board
+    tree = TurnQueries(bot).tree(STRICT)
+    last = 0
+    for idx in tree.walk():
+        last = idx
+    return bot.board.coords(last)
+
+
+def timed(repeats, call):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = call()
+    return (time.perf_counter() - start) * 1e6 / repeats, result
+
+
+def run(size, walls, repeats, rng):
+    bot = make_bot(size, walls, rng)
+    gx, gy = far_cell(bot)
+    rows = []
+    for name, call in [
+        ('path_to', lambda: TurnQueries(bot).path_to(gx, gy)),
+        ('nearest_group', lambda: TurnQueries(bot).nearest_group(-2)),
+        # no fog on these boards, so the whole reachable board is searched
+        ('nearest_fog', lambda: TurnQueries(bot).tree(STRICT).nearest(bot.board.members(-1))),
+    ]:
+        bot.set_search_backend(QUEUE)
+        queue_us, queue_result = timed(repeats, call)
+        bot.set_search_backend(BITBOARD)
+        bitboard_us, bitboard_result = timed(repeats, call)
+        same = queue_result == bitboard_result
+        rows.append((name, queue_us, bitboard_us, same))
+    return rows
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rng = random.Random(0)
+    print(f"{'board':>8} {'search':>14} {'queue us':>10} {'bitboard us':>12} {'speedup':>8}  same")
+    for size in (10, 20, 32, 50):
+        for name, queue_us, bitboard_us, same in run(size, 0.25, repeats, rng):
+            print(f"{size:>4}x{size:<3} {name:>14} {queue_us:10.1f} {bitboard_us:12.1f} "
+                  f"{queue_us / bitboard_us:7.2f}x  {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+
+from simulator import SubprocessAgent, load_map, play
+from simulator.cases import MAPS_DIR
+
+# plays the bot on every map of world1, tutorials included, each with the map's own 'Turn Limit', through the
+# headless simulator, and records per map the outcome, the turns used, the decision latency of every turn
+# after the first (p50 / p99 / max) and the bot's peak RSS:
+#   python bench_suite.py run [--out baseline.json] [--repeat N] [map ...]
+#   python bench_suite.py compare baseline.json [current.json]
+# compare plays the suite again unless given a second file and exits 1 when a map is lost that was won, uses
+# more turns or answers slower than the thresholds allow. Latencies depend on the machine, compare against
+# a baseline recorded on the same one.
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'world1.json')
+WORLD = 'world1'
+BOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')
+
+# a regression is worse than the baseline by both the ratio and the absolute slack
+TURNS_RATIO = 0.10
+TURNS_SLACK = 2
+LATENCY_RATIO = 0.50
+# the tail of a short game is a handful of turns, it gets more room
+LATENCY_SLACK_MS = {'p50_ms': 0.25, 'p99_ms': 1.0}
+
+
+def percentile(values, q):
+    # nearest rank on sorted values
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def maps(names=None):
+    paths = sorted(glob.glob(os.path.join(MAPS_DIR, WORLD, '*.tmx')))
+    if names:
+        paths = [path for path in paths if os.path.splitext(os.path.basename(path))[0] in names]
+    return paths
+
+
+def run_map(path, bot, repeat):
+    # turns are the same every run; the latencies of all runs are pooled, so the tail of a short game is
+    # more than its few slowest turns, and the RSS is the lowest peak
+    spec = load_map(path)
+    latencies = []
+    peaks = []
+    for _ in range(repeat):
+        agent = SubprocessAgent([sys.executable, bot])
+        result = play(spec, agent, turn_time=None)
+        latencies.extend(ms * 1000 for ms in result.latencies[1:])
+        if agent.peak_rss:
+            peaks.append(agent.peak_rss)
+    latencies.sort()
+    return {'won': result.won, 'turns': result.turns, 'turn_limit': result.turn_limit,
+            'deaths': result.deaths, 'resets': result.resets, 'crashed': result.crashed,
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'max_ms': round(latencies[-1] if latencies else 0.0, 3),
+            'over_budget': sum(1 for ms in latencies if ms > 100) / repeat,
+            'peak_rss_mb': round(min(peaks) / 2 ** 20, 1) if peaks else None}
+
+
+def run_suite(bot, repeat, names=None, log=sys.stderr):
+    results = {}
+    for path in maps(names):
+        name = os.path.splitext(os.path.basename(path))[0]
+        start = time.perf_counter()
+        results[name] = run_map(path, bot, repeat)
+        row = results[name]
+        print(f"{name:10} {'won' if row['won'] else 'lost':4} {row['turns']:4}/{row['turn_limit']:<4} "
+              f"p50={row['p50_ms']:.2f}ms p99={row['p99_ms']:.2f}ms max={row['max_ms']:.2f}ms "
+              f"rss={row['peak_rss_mb']}MB ({time.perf_counter() - start:.1f}s)", file=log)
+    return {'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'processor': platform.processor() or platform.machine()},
+            'repeat': repeat,
+            'maps': results}
+
+
+def regressions(baseline, current):
+    # (map, what) for every map of the baseline that got worse in current
+    found = []
+    for name, old in sorted(baseline['maps'].items()):
+        new = current['maps'].get(name)
+        if new is None:
+            found.append((name, 'missing'))
+            continue
+        if old['won'] and not new['won']:
+            found.append((name, 'lost'))
+        elif old['won'] and new['turns'] > max(old['turns'] * (1 + TURNS_RATIO), old['turns'] + TURNS_SLACK):
+            found.append((name, f"turns {old['turns']} -> {new['turns']}"))
+        for key, slack in LATENCY_SLACK_MS.items():
+            if new[key] > max(old[key] * (1 + LATENCY_RATIO), old[key] + slack):
+                found.append((name, f'{key} {old[key]} -> {new[key]}'))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_suite.py')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run')
+    run.add_argument('maps', nargs='*')
+    run.add_argument('--out', default=BASELINE)
+    run.add_argument('--repeat', type=int, default=5)
+    run.add_argument('--bot', default=BOT)
+    compare = sub.add_parser('compare')
+    compare.add_argument('baseline', nargs='?', default=BASELINE)
+    compare.add_argument('current', nargs='?')
+    compare.add_argument('--repeat', type=int, default=5)
+    compare.add_argument('--bot', default=BOT)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run_suite(args.bot, args.repeat, args.maps)
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+            f.write('\n')
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run_suite(args.bot, args.repeat, list(baseline['maps']))
+    found = regressions(baseline, current)
+    for name, what in found:
+        print(f'REGRESSION {name}: {what}')
+    if not found:
+        print(f"no regressions against {args.baseline} ({len(baseline['maps'])} maps)")
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+from grid import DIRECTIONS, count_bits
+
+# BFS over big-int bitboards: bit y * width + x stands for a cell, and a whole frontier is expanded with a
+# handful of shifts and masks instead of one deque pop per cell. The per-node BFS hands every cell the
+# path through its earliest queued parent, which works out to the lexicographically smallest shortest
+# path when moves are ordered as in DIRECTIONS; answers here walk that same path, so first moves and
+# obstacles agree with the queue.
+
+NO_ANSWER = (-1, 'PASS', 0)
+
+
+class Shifter(object):
+    # neighbour masks of a board size
+    def __init__(self, width, height):
+        self.width = width
+        self.full = (1 << width * height) - 1
+        first_column = 0
+        for y in range(height):
+            first_column |= 1 << y * width
+        last_column = first_column << width - 1
+        self.not_first_column = self.full & ~first_column
+        self.not_last_column = self.full & ~last_column
+
+    def step(self, bits, k):
+        # the cells one move in DIRECTIONS[k] from `bits`
+        if k == 0:
+            return (bits & self.not_first_column) >> 1
+        if k == 1:
+            return (bits & self.not_last_column) << 1
+        if k == 2:
+            return bits >> self.width
+        return (bits << self.width) & self.full
+
+    def around(self, bits):
+        return ((bits & self.not_first_column) >> 1) | ((bits & self.not_last_column) << 1) | \
+               (bits >> self.width) | ((bits << self.width) & self.full)
+
+
+shifters = {}
+
+
+def shifter(width, height):
+    if (width, height) not in shifters:
+        shifters[(width, height)] = Shifter(width, height)
+    return shifters[(width, height)]
+
+
+def group_mask(board, table):
+    # cells of every group `table` maps to True
+    bits = 0
+    for gid, flag in table.items():
+        if flag:
+            bits |= board.members(gid)
+    return bits
+
+
+class BitboardTree(object):
+    # the SearchTree interface on bitboards; passable / leaf / risky map a group id to a bool, leaves can be
+    # reached but are not expanded. Layers are grown on demand like SearchTree's queue.
+    def __init__(self, board, start, passable, leaf, risky, metrics):
+        self.board = board
+        self.metrics = metrics
+        self.shifter = shifter(board.width, board.height)
+        self.passable = group_mask(board, passable)
+        # the start is always expanded, whatever it stands on
+        self.leaves = group_mask(board, leaf) & ~self.passable & ~(1 << start)
+        self.allowed = self.passable | self.leaves
+        self.risky = risky
+        self.start = start
+        self.visited = 1 << start
+        # layers[d]: the cells at distance d, layer 0 is the start
+        self.layers = [1 << start]
+        self.done = False
+
+    def expand(self):
+        # adds the next layer; False once nothing new is reachable
+        if self.done:
+            return False
+        frontier = self.layers[-1]
+        if len(self.layers) > 1:
+            frontier &= self.passable
+        layer = self.shifter.around(frontier) & self.allowed & ~self.visited
+        if not layer:
+            self.done = True
+            return False
+        self.visited |= layer
+        self.layers.append(layer)
+        self.metrics.nodes += count_bits(layer)
+        return True
+
+    def reach(self, idx):
+        bit = 1 << idx
+        while not self.visited & bit and self.expand():
+            pass
+        return self.visited & bit != 0
+
+    def is_leaf(self, idx):
+        return self.leaves >> idx & 1 == 1
+
+    def answer(self, idx):
+        bit = 1 << idx
+        for d, layer in enumerate(self.layers):
+            if layer & bit:
+                return self.path_answer(bit, d)
+        return NO_ANSWER
+
+    def path_answer(self, targets, d):
+        # (d, first move, first risky group) of the smallest shortest path to any of `targets`, which all
+        # lie on layer d: mark the layer cells that lead to a target, then step forward taking the first
+        # direction that stays on them
+        if d == 0:
+            return 0, 'PASS', 0
+        shifter = self.shifter
+        passable = self.passable
+        layers = self.layers
+        leads = [0] * (d + 1)
+        leads[d] = targets
+        for i in range(d - 1, 0, -1):
+            leads[i] = shifter.around(leads[i + 1]) & layers[i] & passable
+        cells = self.board.cells
+        risky = self.risky
+        first = 'PASS'
+        obstacle = 0
+        bit = 1 << self.start
+        for i in range(1, d + 1):
+            for k in range(4):
+                step = shifter.step(bit, k) & leads[i]
+                if step:
+                    bit = step
+                    if i == 1:
+                        first = DIRECTIONS[k][2]
+                    break
+            if not obstacle:
+                gid = cells[bit.bit_length() - 1]
+                if risky[gid]:
+                    obstacle = gid
+        return d, first, obstacle
+
+    def nearest(self, mask, leaves=True):
+        # the first cell of the bitset `mask` in BFS order
+        if not leaves:
+            mask &= ~self.leaves
+        d = 0
+        while True:
+            while d >= len(self.layers):
+                if not self.expand():
+                    return NO_ANSWER
+            hit = self.layers[d] & mask
+            if hit:
+                return self.path_answer(hit, d)
+            d += 1
+
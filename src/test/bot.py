@@ -1,7 +1,25 @@
-import copy
-import queue
-import sys
-from collections import deque
+import itertools
+import os
+import signal
+
+from connectivity import Connectivity
+from deadline import TurnClock
+from fields import FieldCache
+from frontier import Frontier
+from grid import Grid, count_bits
+from levers import LeverSearch
+from logs import log
+from metrics import Metrics, start_profile, stop_profile
+from model import BITS, GroupProps, Shift, ShiftType
+from observation import Observer
+from plans import PlanExecutor
+from protocol import Reader
+from queries import FOG, QUEUE, SEARCH_ENV, STRICT, UNDISCOVERED, TurnQueries
+from transcript import recorder_from_env
+from world import capture, install
+
+# board writes kept behind the spawn state, so the caches' stamps of earlier turns can still be compared
+JOURNAL_KEEP = 4096
 
 
 class Bot(object):
@@ -9,15 +27,23 @@ class Bot(object):
         # init board
         self.width = x
         self.height = y
-        self.board = []
-        self.blocks = {-1: {}, 0: {}, 1: {}}
-        for i in range(y):
-            self.board.append([])
-            for j in range(x):
-                self.board[i].append(-1)
-                self.blocks[-1][(j, i)] = True
-
-        self.board[sy][sx] = 0
+        self.board = Grid(x, y)
+        self.board.set(self.board.index(sx, sy), 0)
+        self.metrics = Metrics(x, y, limit)
+        self.search_backend = None
+        self.set_search_backend(os.environ.get(SEARCH_ENV, QUEUE))
+        self.queries = None
+        # what the distance fields were built on: every change to the board or to whether a group can be
+        # walked on takes a fresh number, a restored world gets its numbers back
+        self.versions = itertools.count(1)
+        self.board_version = 0
+        self.groups_version = 0
+        self.fields = FieldCache(self.metrics)
+        self.frontier = Frontier(self.board)
+        self.plans = PlanExecutor(self)
+        self.connectivity = Connectivity(self)
+        self.lever_search = LeverSearch(self)
+        self.clock = TurnClock()
         self.spawn = (sx, sy)
         self.cx = sx
         self.cy = sy
@@ -29,6 +55,10 @@ class Bot(object):
         self.known_levers = {}
         self.flags = {}
         self.shift_history = []
+        # the model at the end of the last turn no lever was in effect, valid while nothing has been learned
+        # since, and the model the current turn should end with if it teaches nothing
+        self.spawn_state = None
+        self.expected_state = None
         self.intent = (-1, -1)
         self.prev_pos = (self.cx, self.cy)
         self.prev_action = "PASS"
@@ -54,27 +84,38 @@ class Bot(object):
         self.groups[1]['unpassable'] = True
         self.groups[1]['kills'] = False
 
+        self.observer = Observer(self)
+
+    def set_search_backend(self, backend):
+        # QUEUE: per-cell BFS trees, BITBOARD: whole-frontier bitboard BFS
+        self.search_backend = backend
+
     def init_group(self, id, reset=False):
         if id not in self.groups or reset:
-            self.groups[id] = {'interactive': -1, 'win': -1, 'blocks_vision': -1,
-                               'unpassable': -1, 'kills': -1}
+            self.groups[id] = GroupProps()
+
+    def touch_board(self):
+        self.board_version = next(self.versions)
 
-    def shift_template(self):
-        return {"id": -2, "type": "unknown", "target_group": -2, "target_change": "", "stored_targets": [],
-                "preshift": -2, "postshift": -2, "stored_group": {}, "lever_position": (-1, -1)}
+    def touch_groups(self, before, after):
+        # pathing() of the groups a change touched, from before and after it; equal means no path moved
+        if before != after:
+            self.groups_version = next(self.versions)
+
+    def pathing(self, gids):
+        return tuple(self.groups[gid].pathing() if gid in self.groups else None for gid in gids)
 
     def change_position(self, cx, cy):
         self.cx = cx
         self.cy = cy
 
     def parse_vision(self, total, x, y, group, is_active, is_win):
-        prev = self.board[y][x]
-        self.board[y][x] = group
-        if group != prev:
-            self.blocks[prev].pop((x, y))
-        if group not in self.blocks:
-            self.blocks[group] = {}
-        self.blocks[group][(x, y)] = True
+        idx = self.board.index(x, y)
+        touched = (group, self.board.cells[idx])
+        before = self.pathing(touched)
+        prev = self.board.set(idx, group)
+        if prev != group:
+            self.touch_board()
         self.init_group(group)
         if is_active:
             is_active = True
@@ -83,24 +124,21 @@ class Bot(object):
         self.groups[group]['interactive'] = is_active
         if is_active and (x, y) not in self.known_levers:
             self.known_levers[(x, y)] = len(self.shifts)
-            shift = copy.deepcopy(self.shift_template())
-            shift["id"] = len(self.shifts)
-            shift["lever_position"] = (x, y)
-            self.shifts.append(shift)
+            self.shifts.append(Shift(len(self.shifts), (x, y)))
 
         # check for 'win'
-        if len(self.shift_history) > 0 and self.shift_history[-1]["type"] == "unknown" and self.shift_history[-1][
-            "target_group"] == group and \
-                is_win != self.shift_history[-1]["stored_group"]["win"] and self.shift_history[-1]["stored_group"][
-            "win"] != -1:
+        if len(self.shift_history) > 0 and self.shift_history[-1].type == ShiftType.UNKNOWN and \
+                self.shift_history[-1].target_group == group and \
+                is_win != self.shift_history[-1].stored_group["win"] and \
+                self.shift_history[-1].stored_group["win"] != -1:
             shift = self.shift_history[-1]
-            self.shifts[shift["id"]]["type"] = "change"
-            self.shift_history[-1]["type"] = "change"
-            self.shifts[shift["id"]]["target_group"] = group
-            self.shift_history[-1]["target_group"] = group
-            self.shifts[shift["id"]]["target_change"] = "win"
-            self.shift_history[-1]["target_change"] = "win"
-            self.groups[group] = copy.deepcopy(shift["stored_group"])
+            self.shifts[shift.id].type = ShiftType.CHANGE
+            self.shift_history[-1].type = ShiftType.CHANGE
+            self.shifts[shift.id].target_group = group
+            self.shift_history[-1].target_group = group
+            self.shifts[shift.id].target_change = "win"
+            self.shift_history[-1].target_change = "win"
+            self.groups[group] = shift.stored_group.copy()
 
         self.groups[group]['win'] = is_win
         if is_win:
@@ -109,23 +147,18 @@ class Bot(object):
             self.flags.pop((x, y))
 
         # check for transformation
-        if len(self.shift_history) > 0 and self.shift_history[-1]["type"] == "unknown" and self.shift_history[-1][
-            "target_group"] == prev and \
+        if len(self.shift_history) > 0 and self.shift_history[-1].type == ShiftType.UNKNOWN and \
+                self.shift_history[-1].target_group == prev and \
                 prev >= 0 and prev != group:
             shift = self.shift_history[-1]
-            self.shifts[shift["id"]]["type"] = "transform"
-            self.shift_history[-1]["type"] = "transform"
-            self.shifts[shift["id"]]["preshift"] = prev
-            self.shift_history[-1]["preshift"] = prev
-            self.shifts[shift["id"]]["postshift"] = group
-            self.shift_history[-1]["postshift"] = group
-            self.shift_history[-1]["stored_targets"].append((x, y))
-            for (gx, gy) in self.blocks[prev]:
-                self.shift_history[-1]["stored_targets"].append((gx, gy))
-                self.board[gy][gx] = group
-                self.blocks[group][(gx, gy)] = True
-            self.blocks[prev] = {}
-            self.groups[prev] = copy.deepcopy(shift["stored_group"])
+            self.shifts[shift.id].type = ShiftType.TRANSFORM
+            self.shift_history[-1].type = ShiftType.TRANSFORM
+            self.shifts[shift.id].preshift = prev
+            self.shift_history[-1].preshift = prev
+            self.shifts[shift.id].postshift = group
+            self.shift_history[-1].postshift = group
+            self.shift_history[-1].stored_targets |= (1 << idx) | self.board.transform(prev, group)
+            self.groups[prev] = shift.stored_group.copy()
 
         # check for 'blocks_vision'
         if self.groups[group]['blocks_vision'] == -1:
@@ -163,36 +196,47 @@ class Bot(object):
                         decision = True
 
             if discerned:
-                if len(self.shift_history) > 0 and self.shift_history[-1]["type"] == "unknown" and \
-                        self.shift_history[-1]["target_group"] == group and \
-                        decision != self.shift_history[-1]["stored_group"]["blocks_vision"] and \
-                        self.shift_history[-1]["stored_group"]["blocks_vision"] != -1:
+                if len(self.shift_history) > 0 and self.shift_history[-1].type == ShiftType.UNKNOWN and \
+                        self.shift_history[-1].target_group == group and \
+                        decision != self.shift_history[-1].stored_group["blocks_vision"] and \
+                        self.shift_history[-1].stored_group["blocks_vision"] != -1:
                     shift = self.shift_history[-1]
-                    self.shifts[shift["id"]]["type"] = "change"
-                    self.shift_history[-1]["type"] = "change"
-                    self.shifts[shift["id"]]["target_group"] = group
-                    self.shift_history[-1]["target_group"] = group
-                    self.shifts[shift["id"]]["target_change"] = "blocks_vision"
-                    self.shift_history[-1]["target_change"] = "blocks_vision"
-                    self.groups[group] = copy.deepcopy(shift["stored_group"])
+                    self.shifts[shift.id].type = ShiftType.CHANGE
+                    self.shift_history[-1].type = ShiftType.CHANGE
+                    self.shifts[shift.id].target_group = group
+                    self.shift_history[-1].target_group = group
+                    self.shifts[shift.id].target_change = "blocks_vision"
+                    self.shift_history[-1].target_change = "blocks_vision"
+                    self.groups[group] = shift.stored_group.copy()
 
                 self.groups[group]['blocks_vision'] = decision
 
+        self.touch_groups(before, self.pathing(touched))
+
     def parse_intent(self, died=False, changed_object=None):
-        print(f"intent: {died}, {changed_object}", file=sys.stderr)
+        log.debug("intent: %s, %s", died, changed_object)
+        self.expected_state = capture(self)
         if self.prev_action == "USE" and (self.cx, self.cy) in self.known_levers:
             id = self.known_levers[(self.cx, self.cy)]
             self.tried_again[id] = True
             if changed_object is not None and changed_object is not False and changed_object is not True:
-                self.shifts[id]["target_group"] = changed_object
+                self.shifts[id].target_group = changed_object
             self.apply_shift(self.shifts[id])
+            shift = self.shift_history[-1]
+            if shift.type == ShiftType.CHANGE and shift.stored_group[shift.target_change] == -1:
+                # flipping an unknown property pins it down, reversing keeps that and the spawn state does not
+                self.spawn_state = None
+            self.expected_state = capture(self)
 
         elif self.prev_action == "RESET":
+            self.metrics.resets += 1
             self.reset_level()
+            log.flush('reset')
 
         elif self.prev_action not in ["USE", "PASS", "RESET"]:
             changes = []
-            group = self.board[self.intent[1]][self.intent[0]]
+            group = self.board.get(self.intent[0], self.intent[1])
+            before = self.pathing((group,))
 
             if self.intent[0] == self.cx and self.intent[1] == self.cy:
                 self.groups[group]["unpassable"] = False
@@ -213,22 +257,22 @@ class Bot(object):
                 changes.append(("kills", True))
                 died = True
 
-            if len(self.shift_history) > 0 and self.shift_history[-1]["type"] == "unknown" and self.shift_history[-1][
-                "target_group"] == group:
+            if len(self.shift_history) > 0 and self.shift_history[-1].type == ShiftType.UNKNOWN and \
+                    self.shift_history[-1].target_group == group:
                 shift = self.shift_history[-1]
                 for (prop, status) in changes:
-                    if status != shift["stored_group"][prop] and shift["stored_group"][prop] != -1:
-                        self.shifts[shift["id"]]["type"] = "change"
-                        self.shift_history[-1]["type"] = "change"
-                        # self.shifts[shift["id"]]["target_group"] = group
-                        # self.shift_history[-1]["target_group"] = group
-                        self.shifts[shift["id"]]["target_change"] = prop
-                        self.shift_history[-1]["target_change"] = prop
-                        self.groups[group] = copy.deepcopy(shift["stored_group"])
+                    if status != shift.stored_group[prop] and shift.stored_group[prop] != -1:
+                        self.shifts[shift.id].type = ShiftType.CHANGE
+                        self.shift_history[-1].type = ShiftType.CHANGE
+                        # self.shifts[shift.id].target_group = group
+                        # self.shift_history[-1].target_group = group
+                        self.shifts[shift.id].target_change = prop
+                        self.shift_history[-1].target_change = prop
+                        self.groups[group] = shift.stored_group.copy()
                     self.groups[group][prop] = status
 
                 # check if last shift is unknown, check if there is only one remaining possibility
-                if shift["type"] == "unknown":
+                if shift.type == ShiftType.UNKNOWN:
                     calc_poss = 0
                     chosen = None
                     for prop in self.groups[group]:
@@ -236,130 +280,27 @@ class Bot(object):
                             calc_poss += 1
                             chosen = prop
                     if calc_poss == 1:
-                        self.shifts[shift["id"]]["type"] = "change"
-                        self.shift_history[-1]["type"] = "change"
-                        self.shifts[shift["id"]]["target_change"] = chosen
-                        self.shift_history[-1]["target_change"] = chosen
+                        self.shifts[shift.id].type = ShiftType.CHANGE
+                        self.shift_history[-1].type = ShiftType.CHANGE
+                        self.shifts[shift.id].target_change = chosen
+                        self.shift_history[-1].target_change = chosen
 
+            self.touch_groups(before, self.pathing((group,)))
             if died:
                 self.reset_level()
-
-    def wide_search(self, sx, sy, target=-2, undiscovered_search=False, undiscovered_traversal=False,
-                    exploration_protocol=False):
-        exploration_queue = deque()
-        exploration_queue.append(((sx, sy), 0, 'PASS', 0))
-        visited = {(sx, sy): True}
-        # print(f"wide_search: {sx}, {sy}, target: {target}", file=sys.stderr)
-        while exploration_queue:
-            point = exploration_queue.popleft()
-            # print(f"{point}", file=sys.stderr)
-            cx = point[0][0]
-            cy = point[0][1]
-            visited[(cx, cy)] = True
-
-            if self.board[cy][cx] == target:
-                return point[1], point[2], point[3]
-            if undiscovered_search:
-                for prop in self.groups[self.board[cy][cx]]:
-                    if self.groups[self.board[cy][cx]][prop] == -1:
-                        return point[1], point[2], point[3]
-
-            for (dx, dy) in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                tx = cx + dx
-                ty = cy + dy
-                if 0 <= tx < self.width and 0 <= ty < self.height and (tx, ty) not in visited:
-                    visited[(tx, ty)] = True
-                    proceed = False
-                    if exploration_protocol and self.board[ty][tx] == -1:
-                        proceed = True
-                    if undiscovered_search:
-                        for prop in self.groups[self.board[ty][tx]]:
-                            if self.groups[self.board[ty][tx]][prop] == -1 and \
-                                    not (prop == 'kills' and self.groups[self.board[ty][tx]]['unpassable'] == True):
-                                proceed = True
-                    if ((undiscovered_traversal and self.groups[self.board[ty][tx]]['unpassable'] == -1) or
-                        (self.groups[self.board[ty][tx]]['unpassable'] == False)) and \
-                            ((undiscovered_traversal and self.groups[self.board[ty][tx]]['kills'] == -1) or
-                             (self.groups[self.board[ty][tx]]['kills'] == False)):
-                        proceed = True
-                    if self.groups[self.board[ty][tx]]['unpassable'] == False and \
-                            self.groups[self.board[ty][tx]]['kills'] == False:
-                        proceed = True
-                    if proceed:
-                        heuristic_length = point[1] + 1
-                        action = point[2]
-                        if point[1] == 0:
-                            action = 'PASS'
-                            if dx == -1:
-                                action = 'LEFT'
-                            if dx == 1:
-                                action = 'RIGHT'
-                            if dy == -1:
-                                action = 'UP'
-                            if dy == 1:
-                                action = 'DOWN'
-                        obstacle = point[3]
-                        if point[3] == 0 and self.board[ty][tx] > 0 and \
-                                (self.groups[self.board[ty][tx]]['kills'] == -1 or self.groups[self.board[ty][tx]][
-                                    'unpassable'] == -1):
-                            obstacle = self.board[ty][tx]
-                        exploration_queue.append(((tx, ty), heuristic_length, action, obstacle))
-
-        return -1, 'PASS', 0
-
-    def find_path(self, sx, sy, gx, gy, undiscovered_traversal=False, fog_traversal=False, exploration_protocol=False):
-        heuristic_length = abs(gx - sx) + abs(gy - sy)
-        if exploration_protocol:
-            heuristic_length = 0
-        exploration_queue = queue.PriorityQueue()
-        exploration_queue.put((heuristic_length, ((sx, sy), heuristic_length, 0, 'PASS', 0)))
-        visited = {(sx, sy): True}
-        # print(f"find_path: {sx}, {sy}, {gx}, {gy}", file=sys.stderr)
-
-        while not exploration_queue.empty():
-            point = exploration_queue.get()[1]
-            # print(point, file=sys.stderr)
-            cx = point[0][0]
-            cy = point[0][1]
-            visited[(cx, cy)] = True
-
-            if (exploration_protocol and self.board[cy][cx] == -1) or (cx == gx and cy == gy):
-                return point[2], point[3], point[4]
-
-            for (dx, dy) in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                tx = cx + dx
-                ty = cy + dy
-                if 0 <= tx < self.width and 0 <= ty < self.height and \
-                        (tx, ty) not in visited and \
-                        ((undiscovered_traversal and self.groups[self.board[ty][tx]]['unpassable'] == -1) or \
-                         (self.groups[self.board[ty][tx]]['unpassable'] == False)) and \
-                        ((undiscovered_traversal and self.groups[self.board[ty][tx]]['kills'] == -1) or \
-                         (self.groups[self.board[ty][tx]]['kills'] == False)) and \
-                        ((fog_traversal and self.board[ty][tx] == -1) or self.board[ty][tx] >= 0):
-                    visited[(tx, ty)] = True
-                    heuristic_length = abs(gx - tx) + abs(gy - ty) + point[2]
-                    if exploration_protocol:
-                        heuristic_length = point[2] + 1
-                    action = point[3]
-                    if point[2] == 0:
-                        action = 'PASS'
-                        if dx == -1:
-                            action = 'LEFT'
-                        if dx == 1:
-                            action = 'RIGHT'
-                        if dy == -1:
-                            action = 'UP'
-                        if dy == 1:
-                            action = 'DOWN'
-                    obstacle = point[4]
-                    if point[4] == 0 and self.board[ty][tx] > 0:
-                        gid = self.board[ty][tx]
-                        if self.groups[gid]['unpassable'] or self.groups[gid]['kills']:
-                            obstacle = self.board[ty][tx]
-                    exploration_queue.put(
-                        (heuristic_length, ((tx, ty), heuristic_length, point[2] + 1, action, obstacle)))
-
-        return -1, 'PASS', 0
+                self.metrics.deaths += 1
+                self.metrics.write('death')
+                log.flush('death')
+
+    def traversal(self, undiscovered_traversal=False, fog_traversal=False):
+        passable = {}
+        risky = {}
+        for gid, group in self.groups.items():
+            walkable = (undiscovered_traversal and group['unpassable'] == -1) or group['unpassable'] == False
+            safe = (undiscovered_traversal and group['kills'] == -1) or group['kills'] == False
+            passable[gid] = walkable and safe and ((fog_traversal and gid == -1) or gid >= 0)
+            risky[gid] = gid > 0 and bool(group['unpassable'] or group['kills'])
+        return passable, risky
 
     def return_choice(self, dir):
         self.prev_action = dir
@@ -376,342 +317,301 @@ class Bot(object):
         self.prev_pos = (self.cx, self.cy)
         return dir
 
-    def attempt_flag(self):
-        used_dir = 'PASS'
-        used_obstacle = 0
-        mx = 9999999
-        if len(self.flags) > 0:
-            # try unknown path
-            for (gx, gy) in self.flags:
-                ln, dir, obstacle = self.find_path(self.cx, self.cy, gx, gy, undiscovered_traversal=True,
-                                                   fog_traversal=True)
-                if 0 <= ln < mx:
-                    mx = ln
-                    used_dir = dir
-                    used_obstacle = obstacle
-            if mx >= 99999:
-                return -1, 'PASS', 0
-
-            # try risky path
-            mx2 = 9999999
-            for (gx, gy) in self.flags:
-                ln, dir, obstacle = self.find_path(self.cx, self.cy, gx, gy, undiscovered_traversal=True)
-                if 0 <= ln < mx2:
-                    mx2 = ln
-                    used_dir = dir
-                    used_obstacle = obstacle
-            if mx2 >= 99999:
-                return mx, used_dir, used_obstacle
-
-            # try straight path
-            mx3 = 9999999
-            for (gx, gy) in self.flags:
-                ln, dir, obstacle = self.find_path(self.cx, self.cy, gx, gy)
-                if 0 <= ln < mx3:
-                    mx3 = ln
-                    used_dir = dir
-                    used_obstacle = obstacle
-            if mx3 >= 99999:
-                # find the closest known member of the group to spare yourself the pain
-                if used_obstacle >= 0 and (
-                        self.groups[used_obstacle]['kills'] == -1 or self.groups[used_obstacle]['unpassable'] == -1):
-                    mx4 = 999999
-                    ln, dir, obstacle2 = self.wide_search(self.cx, self.cy, target=used_obstacle,
-                                                          undiscovered_traversal=True)
-                    if 0 <= ln < mx4 and used_obstacle == obstacle2:
-                        return ln, dir, obstacle
-                return mx2, used_dir, used_obstacle
-
-            return mx3, used_dir, used_obstacle
-
-        return -1, 'PASS', 0
-
-    def attempt_explore(self):
-        ln, dir, obstacle = self.wide_search(self.cx, self.cy, target=-1, exploration_protocol=True)
-        if 0 <= ln < 99999:
-            return ln, dir, obstacle
-
-        ln, dir, obstacle = self.wide_search(self.cx, self.cy, target=-1, exploration_protocol=True,
-                                             undiscovered_traversal=True)
-        if 0 <= ln < 99999:
-            if obstacle >= 0 and (self.groups[obstacle]['kills'] == -1 or self.groups[obstacle]['unpassable'] == -1):
-                mx4 = 999999
-                ln, dir, obstacle2 = self.wide_search(self.cx, self.cy, target=obstacle, undiscovered_traversal=True)
-                if 0 <= ln < mx4 and obstacle == obstacle2:
-                    return ln, dir, obstacle
-            return ln, dir, obstacle
-        """
-        for (gx, gy) in self.blocks[-1]:
-            ln, dir, obstacle = self.find_path(self.cx, self.cy, gx, gy, fog_traversal=True, exploration_protocol=True)
-            if 0 <= ln < 99999:
-                return ln, dir, obstacle
-
-            ln, dir, obstacle = self.find_path(self.cx, self.cy, gx, gy, fog_traversal=True, undiscovered_traversal=True, exploration_protocol=True)
-            if 0 <= ln < 99999:
-                return ln, dir, obstacle
-
+    def attempt_flag(self, keep=False):
+        # straight path if there is one, else through unknown groups, else through the fog; with keep a
+        # path taken as it is becomes the plan for the turns after
+        if not any(self.queries.reachable(x, y, FOG) for (x, y) in self.flags):
+            return -1, 'PASS', 0
+        ln, dir, obstacle, _, tier = self.queries.safest_goal(self.flags)
+        if ln < 0:
             return -1, 'PASS', 0
-        """
-        return -1, 'PASS', 0
+        if tier == UNDISCOVERED:
+            return self.approach(ln, dir, obstacle)
+        if keep:
+            self.plans.start('get flag', self.queries.safest_route(self.flags))
+        return ln, dir, obstacle
+
+    def approach(self, ln, dir, obstacle):
+        # find the closest known member of the group to spare yourself the pain
+        if obstacle >= 0 and (self.groups[obstacle]['kills'] == -1 or self.groups[obstacle]['unpassable'] == -1):
+            ln2, dir2, obstacle2 = self.queries.nearest_group(obstacle, FOG)
+            if ln2 >= 0 and obstacle == obstacle2:
+                return ln2, dir2, obstacle
+        return ln, dir, obstacle
+
+    def attempt_explore(self, keep=False):
+        # the nearest way into the fog, through the frontier the vision keeps; keep as for attempt_flag
+        ln, dir, obstacle, cluster, tier = self.queries.nearest_frontier()
+        if ln < 0:
+            return -1, 'PASS', 0
+        log.debug("frontier cluster of %d cells at %d", count_bits(cluster), ln)
+        if tier != STRICT:
+            return self.approach(ln, dir, obstacle)
+        if keep:
+            self.plans.start('explore level', self.queries.frontier_route())
+        return ln, dir, obstacle
 
     def apply_shift(self, shift):
-        self.shift_history.append(copy.deepcopy(shift))
-        if shift["target_group"] not in self.groups:
-            self.init_group(shift["target_group"])
-        self.shift_history[-1]["stored_group"] = copy.deepcopy(self.groups[shift["target_group"]])
-        if shift["type"] == "change":
-            # print(self.shift_history[-1]["stored_group"], file=sys.stderr)
-            if self.groups[shift["target_group"]][shift["target_change"]]:
-                self.groups[shift["target_group"]][shift["target_change"]] = False
+        # the undo record is a slot copy of the shift holding the target group's properties from before
+        # and, for a transform, the cells it moved
+        record = shift.copy()
+        if shift.target_group not in self.groups:
+            self.init_group(shift.target_group)
+        record.stored_group = self.groups[shift.target_group].copy()
+        self.shift_history.append(record)
+        if shift.type == ShiftType.CHANGE:
+            group = self.groups[shift.target_group]
+            if group[shift.target_change]:
+                group[shift.target_change] = False
             else:
-                self.groups[shift["target_group"]][shift["target_change"]] = True
-            # print(self.shift_history[-1]["stored_group"], file=sys.stderr)
-        elif shift["type"] == "unknown":
-            self.init_group(shift["target_group"], reset=True)
-        elif shift["type"] == "transform":
-            for (gx, gy) in self.blocks[shift["preshift"]]:
-                self.shift_history[-1]["stored_targets"].append((gx, gy))
-                self.board[gy][gx] = shift["postshift"]
-                self.blocks[shift["postshift"]][(gx, gy)] = True
-            self.blocks[shift["preshift"]] = {}
+                group[shift.target_change] = True
+            self.touch_groups(record.stored_group.pathing(), group.pathing())
+        elif shift.type == ShiftType.UNKNOWN:
+            self.init_group(shift.target_group, reset=True)
+            self.touch_groups(record.stored_group.pathing(), self.groups[shift.target_group].pathing())
+        elif shift.type == ShiftType.TRANSFORM:
+            moved = self.board.transform(shift.preshift, shift.postshift)
+            record.stored_targets |= moved
+            if moved:
+                self.touch_board()
 
     def reverse_shift(self):
         if len(self.shift_history) > 0:
             shift = self.shift_history.pop()
             # print(f"{shift['preshift']}, {shift['postshift']}", file=sys.stderr)
-            if shift["type"] == "transform":
-                for (gx, gy) in shift["stored_targets"]:
-                    self.board[gy][gx] = shift["preshift"]
-                    self.blocks[shift["postshift"]].pop((gx, gy))
-                    self.blocks[shift["preshift"]][(gx, gy)] = True
-            elif shift["type"] == "change" or shift["type"] == "unknown":
-                #print(shift["target_group"], shift["stored_group"], self.groups[shift["target_group"]], file=sys.stderr)
-                if shift["type"] == "change":
-                    group = self.groups[shift["target_group"]]
-                    for prop in group:
-                        if shift["stored_group"][prop] == -1 and group[prop] != -1:
-                            shift["stored_group"][prop] = group[prop]
-                            if shift["target_change"] == prop:
-                                if shift["stored_group"][prop]:
-                                    shift["stored_group"][prop] = False
-                                else:
-                                    shift["stored_group"][prop] = True
-                self.groups[shift["target_group"]] = shift["stored_group"]
+            if shift.type == ShiftType.TRANSFORM:
+                self.board.paint(shift.stored_targets, shift.preshift)
+                if shift.stored_targets:
+                    self.touch_board()
+            elif shift.type == ShiftType.CHANGE or shift.type == ShiftType.UNKNOWN:
+                stored = shift.stored_group
+                if shift.type == ShiftType.CHANGE:
+                    # keep what was learned about the group while the shift was applied, with the changed
+                    # property flipped back
+                    group = self.groups[shift.target_group]
+                    learned = group.known & ~stored.known
+                    stored.known |= learned
+                    stored.value = (stored.value & ~learned) | (group.value & learned)
+                    stored.value ^= learned & BITS.get(shift.target_change, 0)
+                self.touch_groups(self.groups[shift.target_group].pathing(), stored.pathing())
+                self.groups[shift.target_group] = stored
+
+    def settle(self):
+        # called once a turn's observation is in the model
+        self.frontier.sync()
+        if not self.shift_history:
+            self.spawn_state = capture(self)
+            # nothing before the spawn state is restored again, only compared with
+            self.board.forget(self.spawn_state.board, JOURNAL_KEEP)
+        elif self.expected_state is None or not self.expected_state.same_model(self):
+            self.spawn_state = None
 
     def reset_level(self):
-        print(f"reset_level: {len(self.shift_history)}", file=sys.stderr)
+        log.info("reset_level: %d", len(self.shift_history))
         self.try_again = False
         self.tried_again = {}
+        if self.shift_history and self.spawn_state is not None and self.expected_state is not None and \
+                self.expected_state.same_model(self):
+            # nothing learned since the levers went in: undoing them gives back the spawn state
+            install(self, self.spawn_state)
+            return
         while len(self.shift_history) > 0:
             self.reverse_shift()
 
-    def shift_search(self, cx, cy, fst=False):
-        if not fst:
-            ln, dir, obstacle = self.attempt_flag()
-            if ln >= 0:
-                return ln, dir, True
-            ln, dir, obstacle = self.attempt_explore()
-            if ln >= 0:
-                return ln, dir, False
-
-        mn = 9999999
-        used_dir = 'PASS'
-        found_flag = False
-        for shift in self.shifts:
-            proceed = False
-            if shift["type"] == "transform":
-                if len(self.blocks[shift["preshift"]]) > 0:
-                    proceed = True
-
-            elif shift["type"] == "change":
-                if (shift["target_change"] in ["kills", "unpassable"] and self.groups[shift["target_group"]][
-                    shift["target_change"]] == True) or \
-                        (shift["target_change"] in ["win"] and self.groups[shift["target_group"]][
-                            shift["target_change"]] == False):
-                    proceed = True
-
-            if proceed:
-                print(f"applying: {shift}", file=sys.stderr)
-                self.apply_shift(shift)
-                ans, _, flag = self.shift_search(shift["lever_position"][0], shift["lever_position"][1])
-                if 0 <= ans:
-                    dist, dir, _ = self.find_path(cx, cy, shift["lever_position"][0], shift["lever_position"][1])
-                    if 0 <= dist:
-                        if (flag and not found_flag) or \
-                                (((not flag and not found_flag) or (flag and found_flag)) and ans + dist < mn):
-                            mn = ans + dist
-                            used_dir = dir
-                            if dist == 0:
-                                used_dir = "USE"
-                print(f"errasing: {shift}", file=sys.stderr)
-                self.reverse_shift()
-
-        if mn >= 9999999:
-            return -1, 'PASS', False
-        return mn, used_dir, found_flag
+    def shift_search(self, cx, cy):
+        return self.lever_search.plan(cx, cy)
+
+    def out_of_time(self):
+        log.warning("out of time in %s", self.clock.stage_name)
+        return self.return_choice(self.clock.best or "PASS")
 
     def make_move(self):
+        # the caller starts self.clock when the turn's observation arrives
+        dir = self.select_move()
+        self.clock.finish(self.clock.stage_name)
+        self.metrics.end_turn(self.clock, dir)
+        if self.intent in self.flags:
+            self.metrics.write('win')
+        return dir
+
+    def select_move(self):
+        # stages run best first; each one is only started while the turn has time left
+        clock = self.clock
+        self.queries = TurnQueries(self)
         mx = 9999999
+        # 0. keep walking the path an earlier turn chose while nothing it relies on changed
+        planned = self.plans.next_move()
+        if planned is not None:
+            stage, dir = planned
+            clock.stage(stage)
+            log.info("%s (planned)", stage)
+            return self.return_choice(dir)
+
         # 1. if you found the flag, try to reach it
-        ln, dir, obstacle = self.attempt_flag()
+        clock.stage('get flag')
+        ln, dir, obstacle = self.attempt_flag(keep=True)
         if 0 <= ln < mx:
-            print("get flag", file=sys.stderr)
+            log.info("get flag")
             return self.return_choice(dir)
 
         # 2. if you cant reach the flag, explore the level
-        ln, dir, obstacle = self.attempt_explore()
+        if clock.expired():
+            return self.out_of_time()
+        clock.stage('explore level')
+        ln, dir, obstacle = self.attempt_explore(keep=True)
         if 0 <= ln < mx:
-            print("explore level", file=sys.stderr)
+            log.info("explore level")
             return self.return_choice(dir)
 
         # 3. if you pulled an unknown lever, try to find out what it did
+        if clock.expired():
+            return self.out_of_time()
+        clock.stage('find lever change')
         if len(self.shift_history) > 0:
             shift = self.shift_history[-1]
-            if shift["type"] == "unknown":
-                ln, dir, obstacle = self.wide_search(self.cx, self.cy, target=shift["target_group"])
+            if shift.type == ShiftType.UNKNOWN:
+                ln, dir, obstacle = self.queries.nearest_group(shift.target_group, STRICT)
                 if 0 <= ln < 99999:
-                    print("find lever change", file=sys.stderr)
+                    log.info("find lever change")
                     return self.return_choice(dir)
 
         # 4. try to use the levers you know to move onward
-        ln, dir, _ = self.shift_search(self.cx, self.cy, fst=True)
+        if clock.expired():
+            return self.out_of_time()
+        clock.stage('shift world')
+        # step 5's answer is cheap and safe, it is what gets played if the lever search eats the turn
+        undiscovered = self.queries.nearest_undiscovered()
+        if undiscovered[0] >= 0:
+            clock.offer(undiscovered[1])
+        ln, dir, _ = self.shift_search(self.cx, self.cy)
         if 0 <= ln < mx:
-            print("shift world", file=sys.stderr)
+            log.info("shift world")
             return self.return_choice(dir)
 
         # 5. try to find out the properties of all known groups
-        ln, dir, obstacle = self.wide_search(self.cx, self.cy, undiscovered_search=True)
+        if clock.expired():
+            return self.out_of_time()
+        clock.stage('explore groups')
+        ln, dir, obstacle = undiscovered
         if 0 <= ln < mx:
-            print("explore groups", file=sys.stderr)
+            log.info("explore groups")
             return self.return_choice(dir)
 
         # 6. experiment with new levers
-        mn = mx
-        used_dir = "PASS"
-        for key in self.known_levers:
-            shift = self.shifts[self.known_levers[key]]
-            if shift["type"] == "unknown" and shift["target_group"] == -2:
-                ln, dir, obstacle = self.find_path(self.cx, self.cy, shift["lever_position"][0],
-                                                   shift["lever_position"][1])
-            if 0 <= ln < mn:
-                mn = ln
-                used_dir = dir
-        if mn < mx:
+        if clock.expired():
+            return self.out_of_time()
+        clock.stage('explore levers')
+        mn, used_dir, _, _ = self.queries.nearest_goal(
+            [key for key, id in self.known_levers.items()
+             if self.shifts[id].type == ShiftType.UNKNOWN and self.shifts[id].target_group == -2 and
+             self.queries.reachable(*key)])
+        if 0 <= mn < mx:
             if mn == 0:
                 used_dir = "USE"
-            print("explore levers", file=sys.stderr)
+            log.info("explore levers")
             return self.return_choice(used_dir)
 
         # 7. fuckin kys
+        clock.stage('kill me')
         if self.prev_action == "RESET":
             self.try_again = True
         if not self.try_again:
-            print("kill me", file=sys.stderr)
+            log.info("kill me")
             return self.return_choice("RESET")
 
         # 8. try unknown levers again
-        mn = mx
-        used_dir = "PASS"
-        for key in self.known_levers:
-            shift = self.shifts[self.known_levers[key]]
-            if shift["type"] == "unknown" and shift["id"] not in self.tried_again:
-                ln, dir, obstacle = self.find_path(self.cx, self.cy, shift["lever_position"][0],
-                                                   shift["lever_position"][1])
-                if 0 <= ln < mn:
-                    mn = ln
-                    used_dir = dir
-        if mn < mx:
+        if clock.expired():
+            return self.out_of_time()
+        clock.stage('try levers again')
+        mn, used_dir, _, _ = self.queries.nearest_goal(
+            [key for key, id in self.known_levers.items()
+             if self.shifts[id].type == ShiftType.UNKNOWN and id not in self.tried_again and
+             self.queries.reachable(*key)])
+        if 0 <= mn < mx:
             if mn == 0:
                 used_dir = "USE"
-            print("try levers again", file=sys.stderr)
+            log.info("try levers again")
             return self.return_choice(used_dir)
 
         # 9. eternal kys
-        print("just leave me", file=sys.stderr)
+        clock.stage('just leave me')
+        log.info("just leave me")
         return self.return_choice("RESET")
 
 
-w, h, limit = [int(i) for i in input().split()]
-init = False
-
-while True:
-    cells, sx, sy = [int(i) for i in input().split()]
-    if not init:
+def main():
+    if hasattr(signal, 'SIGUSR1'):
+        # kill -USR1 <pid> dumps the log ring while the game runs
+        signal.signal(signal.SIGUSR1, lambda signum, frame: log.flush('request'))
+    start_profile()
+    reader = Reader()
+    recorder = recorder_from_env()
+    if recorder is not None:
+        reader.tap = recorder.lines
+    try:
+        play(reader, recorder)
+    except BaseException:
+        log.flush('crash')
+        raise
+    finally:
+        stop_profile()
+        if recorder is not None:
+            recorder.close()
+
+
+def observe(bot, obs, w, h, limit):
+    # takes one turn's observation into the model, making the bot on the first turn; the caller asks
+    # make_move next
+    sx = obs.sx
+    sy = obs.sy
+    if bot is None:
         bot = Bot(w, h, sx, sy, 4, limit)
-        init = True
+    bot.clock.start(obs.received)
+    log.turn = bot.clock.turn
     bot.change_position(sx, sy)
 
-    used_cells = {}
-    total_cells = []
     changed_object = False
     died = False
-
-    prev_cx = None
-    prev_cy = None
-    chosen_group = -2
-    chosen_win = False
-    chosen_interactive = False
-    for i in range(cells):
-        buf = input().split(' ')
-        cx = int(buf[0])
-        cy = int(buf[1])
-        #print(buf, file=sys.stderr)
-        if prev_cx is not None and (cx != prev_cx or cy != prev_cy):
-            total_cells.append([prev_cx, prev_cy, chosen_group, chosen_interactive, chosen_win])
-            # print(f"{cx}, {cy}, {chosen_group}, {chosen_interactive}, {chosen_win}", file=sys.stderr)
-            used_cells[(prev_cx, prev_cy)] = True
-            if (prev_cx, prev_cy) in bot.known_levers and prev_cx == sx and prev_cy == sy and chosen_interactive and chosen_interactive is not True:
-                id = bot.known_levers[(bot.cx, bot.cy)]
-                if bot.shifts[id]["target_group"] == -2:
-                    changed_object = chosen_interactive
-
-            chosen_group = -2
-            chosen_win = False
-            chosen_interactive = False
-
-        props = str(buf[2])
-        group = -2
-        win = False
-        interactive = False
-        for prop in props.split(","):
-            if prop[0] == "O":
-                group = int(prop[12:])
-            if prop[0] == "W":
-                win = True
-            if prop[0] == "I":
-                if prop[9] == "?":
-                    interactive = True
-                else:
-                    interactive = int(prop[9:])
-        if interactive or group > chosen_group:
-            if interactive:
-                chosen_group = 9999
-            else:
-                chosen_group = group
-            chosen_win = win
-            chosen_interactive = interactive
-        prev_cx = cx
-        prev_cy = cy
-
-    total_cells.append([cx, cy, chosen_group, chosen_interactive, chosen_win])
-    # print(f"{cx}, {cy}, {chosen_group}, {chosen_interactive}, {chosen_win}", file=sys.stderr)
-    used_cells[(cx, cy)] = True
-    if (cx, cy) in bot.known_levers and cx == sx and cy == sy and chosen_interactive and chosen_interactive is not True:
+    target = obs.lever_target()
+    if target and (sx, sy) in bot.known_levers:
         id = bot.known_levers[(bot.cx, bot.cy)]
-        if bot.shifts[id]["target_group"] == -2:
-            changed_object = chosen_interactive
+        if bot.shifts[id].target_group == -2:
+            changed_object = target
 
-    #print(total_cells, file=sys.stderr)
     bot.parse_intent(died, changed_object)
-    for cell in total_cells:
-        bot.parse_vision(used_cells, cell[0], cell[1], cell[2], cell[3], cell[4])
-
-    #for key in bot.groups:
-    #    print(f"{key}: {bot.groups[key]}", file=sys.stderr)
-    #for i in range(len(bot.shifts)):
-    #    print(f"{i}: {bot.shifts[i]}", file=sys.stderr)
-    # for i in range(len(bot.shift_history)):
-    #    print(f"{i}: {bot.shift_history[i]}", file=sys.stderr)
-    # for i in range(bot.height):
-    #    print(bot.board[i], file=sys.stderr)
-    print(bot.make_move())
+    bot.observer.update(obs)
+    bot.settle()
+    return bot
+
+
+def play(reader, recorder=None):
+    w, h, limit = reader.read_header()
+    bot = None
+
+    while True:
+        try:
+            obs = reader.read_turn()
+        except EOFError:
+            if bot is not None:
+                bot.metrics.write('exit')
+            return bot
+        if recorder is not None:
+            recorder.write_input()
+        bot = observe(bot, obs, w, h, limit)
+
+        #for key in bot.groups:
+        #    print(f"{key}: {bot.groups[key]}", file=sys.stderr)
+        #for i in range(len(bot.shifts)):
+        #    print(f"{i}: {bot.shifts[i]}", file=sys.stderr)
+        # for i in range(len(bot.shift_history)):
+        #    print(f"{i}: {bot.shift_history[i]}", file=sys.stderr)
+        # for i in range(bot.height):
+        #    print(bot.board.cells[i * bot.width:(i + 1) * bot.width], file=sys.stderr)
+        move = bot.make_move()
+        if recorder is not None:
+            recorder.write_answer(move)
+        print(move)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+from bitboard import group_mask
+from grid import iter_bits, neighbours
+from metrics import timed
+from queries import MODES
+
+# Which cells of a traversal mode can reach each other, as a union-find over the cells the mode may walk on.
+# Revealing the map mostly adds walkable cells, and adding is what a union-find does cheaply: the
+# components of a world are taken from the last ones built whose walkable cells are a subset of its own,
+# and only the new cells are joined in. A cell lost to a wall or a group that turned deadly splits
+# components, which a union-find cannot undo, so that world is built again. Asking whether two cells are
+# connected is then two finds, and a search that could only have ended in 'unreachable' is never started.
+
+
+class Components(object):
+    __slots__ = ('width', 'around', 'mask', 'parent', 'versions')
+
+    def __init__(self, board, mask):
+        self.width = board.width
+        self.around = neighbours(board.width, board.height)
+        self.mask = 0
+        self.parent = list(range(board.size))
+        self.versions = None
+        self.add(mask)
+
+    def copy(self):
+        components = Components.__new__(Components)
+        components.width = self.width
+        components.around = self.around
+        components.mask = self.mask
+        components.parent = self.parent[:]
+        components.versions = None
+        return components
+
+    def find(self, idx):
+        parent = self.parent
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    def add(self, cells):
+        # joins the walkable cells `cells` to their walkable neighbours
+        mask = self.mask | cells
+        self.mask = mask
+        parent = self.parent
+        find = self.find
+        for idx in iter_bits(cells):
+            root = find(idx)
+            for tidx, _ in self.around[idx]:
+                if mask >> tidx & 1:
+                    other = find(tidx)
+                    if other != root:
+                        parent[other] = root
+
+    def reachable(self, start, goal):
+        # whether a path of walkable cells leads from start onto goal; start itself does not have to be
+        # walkable, the player may stand anywhere
+        if start == goal:
+            return True
+        mask = self.mask
+        if not mask >> goal & 1:
+            return False
+        root = self.find(goal)
+        for tidx, _ in self.around[start]:
+            if mask >> tidx & 1 and self.find(tidx) == root:
+                return True
+        return False
+
+
+class Connectivity(object):
+    # the Components of each traversal mode for the live world, the last few kept per mode so a lookahead
+    # that returns to the live world finds them again
+    def __init__(self, bot, size=4):
+        self.bot = bot
+        self.metrics = bot.metrics
+        self.size = size
+        self.recent = {mode: [] for mode in MODES}
+
+    def components(self, mode):
+        bot = self.bot
+        versions = (bot.board_version, bot.groups_version)
+        recent = self.recent[mode]
+        for components in recent:
+            if components.versions == versions:
+                return components
+        passable, _ = bot.traversal(*MODES[mode])
+        mask = group_mask(bot.board, passable)
+        components = self.update(recent, mask)
+        components.versions = versions
+        if components in recent:
+            recent.remove(components)
+        recent.insert(0, components)
+        del recent[self.size:]
+        return components
+
+    @timed('components')
+    def update(self, recent, mask):
+        for components in recent:
+            if components.mask == mask:
+                return components
+        for components in recent:
+            if not components.mask & ~mask:
+                components = components.copy()
+                components.add(mask & ~components.mask)
+                return components
+        return Components(self.bot.board, mask)
+
+    def reachable(self, mode, start, goal):
+        return self.components(mode).reachable(start, goal)
@@ -0,0 +1,80 @@
+import time
+
+# Referee.kt: turnMaxTime = firstTurnMaxTime = 100 ms, and going over loses the game
+TURN_BUDGET = 0.100
+# kept back for printing the move, the pipe and the scheduler
+MARGIN = 0.025
+
+# the longest each make_move stage may run, in seconds; a stage never gets more than what is left of
+# the turn, and only the searches that can stop early ('shift world') actually look at theirs
+STAGE_BUDGETS = {
+    'get flag': 0.020,
+    'explore level': 0.020,
+    'find lever change': 0.010,
+    'shift world': 0.050,
+    'explore groups': 0.010,
+    'explore levers': 0.010,
+    'try levers again': 0.010,
+}
+
+
+class TurnClock(object):
+    # monotonic deadlines for one turn at a time, plus the best move any stage has offered so far so an
+    # interrupted turn still has something to play
+    def __init__(self, turn_budget=TURN_BUDGET, margin=MARGIN, stage_budgets=None):
+        self.turn_budget = turn_budget
+        self.margin = margin
+        self.stage_budgets = dict(STAGE_BUDGETS)
+        if stage_budgets is not None:
+            self.stage_budgets.update(stage_budgets)
+        self.turn = 0
+        self.started = 0.0
+        self.deadline = 0.0
+        self.stage_name = None
+        self.stage_deadline = 0.0
+        self.stage_started = 0.0
+        # (stage, seconds spent) for the stages of the current turn, in the order they ran
+        self.stage_times = []
+        self.best = None
+        # (turn, stage that decided, milliseconds left of the turn budget) for every finished turn
+        self.history = []
+
+    def start(self, started=None):
+        # started is when the turn's observation arrived, if the reader knows it
+        self.turn += 1
+        self.started = time.monotonic() if started is None else started
+        self.deadline = self.started + self.turn_budget - self.margin
+        self.stage_name = None
+        self.stage_deadline = self.deadline
+        self.stage_times = []
+        self.best = None
+
+    def end_stage(self, now):
+        if self.stage_name is not None:
+            self.stage_times.append((self.stage_name, now - self.stage_started))
+
+    def stage(self, name):
+        now = time.monotonic()
+        self.end_stage(now)
+        self.stage_name = name
+        self.stage_started = now
+        self.stage_deadline = min(self.deadline, now + self.stage_budgets.get(name, 0.0))
+        return self.stage_deadline
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def stage_expired(self):
+        return time.monotonic() >= self.stage_deadline
+
+    def offer(self, dir):
+        # a move some stage would settle for; the first offer of a turn is kept, stages run best first
+        if self.best is None and dir is not None:
+            self.best = dir
+
+    def finish(self, stage):
+        now = time.monotonic()
+        self.end_stage(now)
+        remaining = (self.started + self.turn_budget - now) * 1000
+        self.history.append((self.turn, stage, round(remaining, 2)))
+        return remaining
@@ -0,0 +1,236 @@
+import heapq
+from collections import OrderedDict
+
+from grid import iter_bits, neighbours
+
+# Distance fields: the cost of reaching a goal set from every cell, grown outwards from the goals instead of
+# from the player. A field holds for as long as the board and the groups' passability stay as they were, so
+# the cache below keys them on the bot's board and group versions and the player can ask again from
+# wherever it stands on later turns. When the versions move on, a field is repaired rather than rebuilt:
+# fields are LPA* searches without a heuristic (D* Lite with nothing tied to the start, so the player
+# moving costs nothing), and only the cells around what changed go back on the queue.
+
+NO_FIELD_ANSWER = (-1, 'PASS', 0, -1)
+INFINITE = 1 << 62
+# fields with fewer cells settled than this are rebuilt, a repair's bookkeeping would cost more
+REPAIR_MIN = 64
+
+
+class DistanceField(object):
+    # reverse LPA* over a cost table: costs maps a group id to the price of stepping onto one of its cells,
+    # groups missing from it cannot be entered, risky flags the groups reported as obstacles. Labels are
+    # cost * span + rank of the goal the cell leads to, so equal costs go to the earlier goal; answers walk
+    # the smallest direction that stays optimal, which is the path the forward BFS would pick. g holds the
+    # settled labels, rhs the one-step lookahead, the queue the cells where the two disagree.
+    # Without charge_goal stepping onto a goal costs 1 whatever its group; without ordered all goals rank
+    # the same and a repair may move the goals.
+    def __init__(self, board, goals, costs, risky, metrics, charge_goal=True, ordered=True):
+        self.board = board
+        self.costs = costs
+        self.risky = risky
+        self.metrics = metrics
+        self.charge_goal = charge_goal
+        self.ordered = ordered
+        self.around = neighbours(board.width, board.height)
+        self.rank = {}
+        for idx in goals:
+            if idx not in self.rank:
+                self.rank[idx] = len(self.rank) if ordered else 0
+        self.span = len(self.rank) if ordered and self.rank else 1
+        self.g = [INFINITE] * board.size
+        self.rhs = [INFINITE] * board.size
+        self.queue = []
+        self.settled = 0
+        # the Observer stamp of the model the field is in sync with, FieldCache fills it in
+        self.stamp = None
+        for idx in self.rank:
+            self.update(idx)
+
+    def copy(self):
+        field = DistanceField.__new__(DistanceField)
+        field.__dict__.update(self.__dict__)
+        field.g = self.g[:]
+        field.rhs = self.rhs[:]
+        field.queue = self.queue[:]
+        return field
+
+    def enter(self, idx):
+        # the price of stepping onto idx, None if it cannot be walked on
+        if not self.charge_goal and idx in self.rank:
+            return 1
+        return self.costs.get(self.board.cells[idx])
+
+    def update(self, idx):
+        # recomputes rhs of idx and queues it if it disagrees with g
+        g = self.g
+        if idx in self.rank and (not self.charge_goal or self.board.cells[idx] in self.costs):
+            best = self.rank[idx]
+        else:
+            span = self.span
+            best = INFINITE
+            for tidx, _ in self.around[idx]:
+                if g[tidx] < best:
+                    step = self.enter(tidx)
+                    if step is not None and g[tidx] + step * span < best:
+                        best = g[tidx] + step * span
+        self.rhs[idx] = best
+        if g[idx] != best:
+            heapq.heappush(self.queue, (min(g[idx], best), idx))
+
+    def grow(self, target):
+        # works the queue until target's label is final; False if no goal can be reached from it
+        g = self.g
+        rhs = self.rhs
+        queue = self.queue
+        around = self.around
+        cells = self.board.cells
+        costs = self.costs
+        rank = self.rank
+        free_goals = not self.charge_goal
+        span = self.span
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        while queue:
+            if g[target] == rhs[target] and queue[0][0] >= g[target]:
+                break
+            key, idx = heappop(queue)
+            old = g[idx]
+            new = rhs[idx]
+            if old == new or key != (new if new < old else old):
+                continue
+            self.metrics.nodes += 1
+            step = 1 if free_goals and idx in rank else costs.get(cells[idx])
+            if old > new:
+                if old == INFINITE:
+                    self.settled += 1
+                g[idx] = new
+                if step is not None:
+                    # a label only went down, the neighbours just compare against it
+                    label = new + step * span
+                    for tidx, _ in around[idx]:
+                        if label < rhs[tidx]:
+                            rhs[tidx] = label
+                            heappush(queue, (label if label < g[tidx] else g[tidx], tidx))
+            else:
+                g[idx] = INFINITE
+                self.settled -= 1
+                self.update(idx)
+                if step is not None:
+                    for tidx, _ in around[idx]:
+                        self.update(tidx)
+        return rhs[target] == g[target] < INFINITE
+
+    def repair(self, goals, costs, risky, dirty):
+        # brings the field to the live model: its cost tables, the goals of an unordered field, and
+        # `dirty`, the cells whose group or passability may have changed since the field was in sync
+        self.costs = costs
+        self.risky = risky
+        if not self.ordered:
+            rank = dict.fromkeys(goals, 0)
+            for idx in set(rank).symmetric_difference(self.rank):
+                dirty |= 1 << idx
+            self.rank = rank
+        around = self.around
+        for idx in iter_bits(dirty):
+            self.update(idx)
+            for tidx, _ in around[idx]:
+                self.update(tidx)
+
+    def walk(self, start):
+        # the (move, cell) steps of the path answers describe, once start's label is final; a None step
+        # means the walk broke off
+        g = self.g
+        span = self.span
+        key = g[start]
+        idx = start
+        while key >= span or idx not in self.rank:
+            for tidx, move in self.around[idx]:
+                step = self.enter(tidx)
+                if step is not None and g[tidx] < INFINITE and g[tidx] + step * span == key:
+                    break
+            else:
+                yield None
+                return
+            yield move, tidx
+            idx = tidx
+            key = g[idx]
+
+    def answer(self, start):
+        # (cost, first move, obstacle, goal index) from start, NO_FIELD_ANSWER if no goal can be reached
+        if not self.grow(start):
+            return NO_FIELD_ANSWER
+        cells = self.board.cells
+        risky = self.risky
+        first = None
+        obstacle = 0
+        idx = start
+        for step in self.walk(start):
+            if step is None:
+                return NO_FIELD_ANSWER
+            move, idx = step
+            if first is None:
+                first = move
+            if not obstacle and risky.get(cells[idx]):
+                obstacle = cells[idx]
+        return self.g[start] // self.span, first or 'PASS', obstacle, idx
+
+    def route(self, start):
+        # every (move, cell) step of the answer's path, empty if no goal can be reached
+        if not self.grow(start):
+            return []
+        steps = list(self.walk(start))
+        return [] if None in steps else steps
+
+
+class FieldCache(object):
+    # least recently used DistanceFields by family and model. A family is the cost table kind, the goal
+    # options and, for ordered goals, the goals themselves; on a miss the newest field of the family is
+    # copied and repaired to the live model instead of being built from nothing, or when the observer can no
+    # longer tell what changed since it (a lookahead backed out of its world), the latest used that it can.
+    def __init__(self, metrics, size=64):
+        self.metrics = metrics
+        self.size = size
+        self.fields = OrderedDict()
+        self.newest = {}
+        self.repair_min = REPAIR_MIN
+
+    def base(self, family, observer):
+        # (field, cells changed since it) to repair from, (None, None) to build afresh
+        newest = self.newest.get(family)
+        if newest is not None and newest.settled >= self.repair_min:
+            dirty = observer.changed(newest.stamp)
+            if dirty is not None:
+                return newest, dirty
+        for (other, _), field in reversed(self.fields.items()):
+            if other == family and field is not newest and field.settled >= self.repair_min:
+                dirty = observer.changed(field.stamp)
+                if dirty is not None:
+                    return field, dirty
+        return None, None
+
+    def get(self, family, model, observer, goals, tables, build):
+        # model names the live board, groups and goals; tables() gives the live (costs, risky), build makes
+        # a fresh field from them
+        key = (family, model)
+        field = self.fields.get(key)
+        if field is not None:
+            self.fields.move_to_end(key)
+            self.metrics.field_hits += 1
+            return field
+        self.metrics.field_misses += 1
+        costs, risky = tables()
+        base, dirty = self.base(family, observer)
+        if base is not None:
+            self.metrics.field_repairs += 1
+            field = base.copy()
+            field.repair(goals, costs, risky, dirty)
+        else:
+            field = build(costs, risky)
+        field.stamp = observer.stamp()
+        self.fields[key] = field
+        self.newest[family] = field
+        if len(self.fields) > self.size:
+            (old_family, _), old = self.fields.popitem(last=False)
+            if self.newest.get(old_family) is old:
+                del self.newest[old_family]
+        return field
@@ -0,0 +1,107 @@
+import itertools
+
+from grid import iter_bits, neighbours
+
+# The exploration frontier: fog cells next to a cell that is not fog. Every path out of the known part of
+# the map enters the fog through one of them, so they are the only fog cells exploration has to aim at. The
+# index follows the board's fog bitset and only looks again at the cells that entered or left the fog since
+# it was last in sync, and around them; a turn that reveals a handful of cells costs a handful of cells.
+
+# the 8 cells around a cell, clusters are joined across corners so a diagonal edge of the fog stays whole
+AROUND = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx or dy]
+
+corner_tables = {}
+
+
+def corners(width, height):
+    # per cell, the cells of AROUND that lie on the board
+    if (width, height) not in corner_tables:
+        table = []
+        for y in range(height):
+            for x in range(width):
+                table.append(tuple((y + dy) * width + x + dx for (dx, dy) in AROUND
+                                   if 0 <= x + dx < width and 0 <= y + dy < height))
+        corner_tables[(width, height)] = table
+    return corner_tables[(width, height)]
+
+
+class Frontier(object):
+    # cells is the frontier bitset, clusters maps a cluster id to the bitset of one 8-connected run of it
+    # and cluster a frontier cell to its id. Clusters an update touches are dissolved and flooded again,
+    # the rest keep their ids.
+    def __init__(self, board):
+        self.board = board
+        self.around = neighbours(board.width, board.height)
+        self.corners = corners(board.width, board.height)
+        self.ids = itertools.count()
+        # the fog the index is in sync with, all of the board before anything was seen
+        self.fog = (1 << board.size) - 1
+        self.cells = 0
+        self.clusters = {}
+        self.cluster = {}
+
+    def on_frontier(self, idx, fog):
+        if not fog >> idx & 1:
+            return False
+        for tidx, _ in self.around[idx]:
+            if not fog >> tidx & 1:
+                return True
+        return False
+
+    def sync(self):
+        # brings the index to the board's fog, returns the frontier bitset
+        fog = self.board.members(-1)
+        changed = fog ^ self.fog
+        if not changed:
+            return self.cells
+        self.fog = fog
+        touched = changed
+        for idx in iter_bits(changed):
+            for tidx, _ in self.around[idx]:
+                touched |= 1 << tidx
+        cells = self.cells
+        cluster = self.cluster
+        stale = set()
+        seeds = 0
+        for idx in iter_bits(touched):
+            bit = 1 << idx
+            if self.on_frontier(idx, fog):
+                if not cells & bit:
+                    cells |= bit
+                    seeds |= bit
+                    for tidx in self.corners[idx]:
+                        if tidx in cluster:
+                            stale.add(cluster[tidx])
+            elif cells & bit:
+                cells &= ~bit
+                stale.add(cluster.pop(idx))
+        self.cells = cells
+        for cid in stale:
+            seeds |= self.clusters.pop(cid) & cells
+        for idx in iter_bits(seeds):
+            cluster.pop(idx, None)
+        self.flood(seeds)
+        return cells
+
+    def flood(self, seeds):
+        # splits the frontier cells `seeds` into 8-connected clusters with fresh ids
+        cells = self.cells
+        while seeds:
+            low = seeds & -seeds
+            cid = next(self.ids)
+            members = low
+            todo = [low.bit_length() - 1]
+            while todo:
+                idx = todo.pop()
+                self.cluster[idx] = cid
+                for tidx in self.corners[idx]:
+                    bit = 1 << tidx
+                    if cells & bit and not members & bit:
+                        members |= bit
+                        todo.append(tidx)
+            self.clusters[cid] = members
+            seeds &= ~members
+
+    def cluster_of(self, idx):
+        # the bitset of the cluster holding frontier cell idx
+        return self.clusters[self.cluster[idx]]
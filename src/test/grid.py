@@ -0,0 +1,181 @@
+from array import array
+
+# neighbour order used by every search, it decides ties between equally long paths
+DIRECTIONS = [(-1, 0, 'LEFT'), (1, 0, 'RIGHT'), (0, -1, 'UP'), (0, 1, 'DOWN')]
+
+
+def iter_bits(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def count_bits(bits):
+    return bin(bits).count("1")
+
+
+neighbour_tables = {}
+
+
+def neighbours(width, height):
+    # per cell, the (cell, move) pairs one step away in DIRECTIONS order
+    if (width, height) not in neighbour_tables:
+        table = []
+        for y in range(height):
+            for x in range(width):
+                steps = []
+                for (dx, dy, move) in DIRECTIONS:
+                    if 0 <= x + dx < width and 0 <= y + dy < height:
+                        steps.append(((y + dy) * width + x + dx, move))
+                table.append(tuple(steps))
+        neighbour_tables[(width, height)] = table
+    return neighbour_tables[(width, height)]
+
+
+class Change(object):
+    # one write to a Grid: `cells` went from group before to group after. Changes point at the change made
+    # before them, so the board's history is a tree and any state of the board is the change that led to it.
+    __slots__ = ('parent', 'depth', 'cells', 'before', 'after')
+
+    def __init__(self, parent, cells, before, after):
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.cells = cells
+        self.before = before
+        self.after = after
+
+
+# flat board of group ids indexed by y * width + x, plus a bitset of cells for every group. Every write is a
+# Change on top of the last, so a snapshot is the last change and going to another one undoes the changes
+# back to where their histories meet and redoes the other's: taking a snapshot costs nothing, restoring one
+# or asking what differs from it costs the changes in between, not the board.
+class Grid(object):
+    def __init__(self, width, height, fill=-1):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.cells = array('i', [fill]) * self.size
+        self.blocks = {fill: (1 << self.size) - 1}
+        self.head = Change(None, 0, fill, fill)
+        # the depth up to which forget() cut the history off
+        self.cut = 0
+
+    def snapshot(self):
+        return self.head
+
+    def path(self, snapshot):
+        # (undo, redo): the changes from the head back to where snapshot's history meets it, newest first,
+        # and from there on to snapshot, oldest first; None if the histories were cut apart
+        head = self.head
+        undo = []
+        redo = []
+        while head.depth > snapshot.depth:
+            undo.append(head)
+            head = head.parent
+            if head is None:
+                return None
+        while snapshot.depth > head.depth:
+            redo.append(snapshot)
+            snapshot = snapshot.parent
+            if snapshot is None:
+                return None
+        while head is not snapshot:
+            undo.append(head)
+            redo.append(snapshot)
+            head = head.parent
+            snapshot = snapshot.parent
+            if head is None or snapshot is None:
+                return None
+        redo.reverse()
+        return undo, redo
+
+    def apply(self, cells, before, after):
+        board = self.cells
+        blocks = self.blocks
+        for idx in iter_bits(cells):
+            board[idx] = after
+        blocks[before] &= ~cells
+        blocks[after] = blocks.get(after, 0) | cells
+
+    def restore(self, snapshot):
+        path = self.path(snapshot)
+        if path is None:
+            raise ValueError('snapshot is no longer in the board history')
+        undo, redo = path
+        for change in undo:
+            self.apply(change.cells, change.after, change.before)
+        for change in redo:
+            self.apply(change.cells, change.before, change.after)
+        self.head = snapshot
+
+    def changed_since(self, snapshot):
+        # the cells holding another group than at snapshot, None if the history cannot tell any more
+        path = self.path(snapshot)
+        if path is None:
+            return None
+        undo, redo = path
+        cells = self.cells
+        seen = 0
+        changed = 0
+        # a cell's group at snapshot: what the last change on snapshot's side wrote, or what the first
+        # change on the head's side found
+        writes = [(change.cells, change.after) for change in reversed(redo)]
+        writes += [(change.cells, change.before) for change in reversed(undo)]
+        for bits, group in writes:
+            for idx in iter_bits(bits & ~seen):
+                if cells[idx] != group:
+                    changed |= 1 << idx
+            seen |= bits
+        return changed
+
+    def forget(self, snapshot, keep=0):
+        # cuts the history off `keep` changes behind snapshot, at least keep changes at a time; snapshots
+        # from before then can no longer be restored or compared with
+        if snapshot.depth - self.cut > 2 * keep:
+            for _ in range(keep):
+                snapshot = snapshot.parent
+            snapshot.parent = None
+            self.cut = snapshot.depth
+
+    def index(self, x, y):
+        return y * self.width + x
+
+    def coords(self, idx):
+        return idx % self.width, idx // self.width
+
+    def get(self, x, y):
+        return self.cells[y * self.width + x]
+
+    def set(self, idx, group):
+        prev = self.cells[idx]
+        if prev != group:
+            bit = 1 << idx
+            self.head = Change(self.head, bit, prev, group)
+            self.blocks[prev] &= ~bit
+            self.blocks[group] = self.blocks.get(group, 0) | bit
+            self.cells[idx] = group
+        return prev
+
+    def members(self, group):
+        return self.blocks.get(group, 0)
+
+    def count(self, group):
+        return count_bits(self.blocks.get(group, 0))
+
+    def transform(self, src, dst):
+        # moves every cell of src into dst, returns the moved cells so the caller can undo it
+        moved = self.blocks.get(src, 0)
+        if src == dst or not moved:
+            return 0
+        self.head = Change(self.head, moved, src, dst)
+        cells = self.cells
+        for idx in iter_bits(moved):
+            cells[idx] = dst
+        self.blocks[dst] = self.blocks.get(dst, 0) | moved
+        self.blocks[src] = 0
+        return moved
+
+    def paint(self, bits, group):
+        for idx in iter_bits(bits):
+            self.set(idx, group)
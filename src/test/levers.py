@@ -0,0 +1,146 @@
+from logs import DEBUG, log
+from metrics import timed
+from model import ShiftType
+from poi import DistanceMatrix
+from queries import TurnQueries
+from world import mark, rewind
+
+NO_PLAN = (-1, 'PASS', False)
+
+
+class LeverSearch(object):
+    # shift_search with memory. A speculative world is identified by the properties of the groups change
+    # levers can flip and the cells of the groups transform levers can move; the value of standing on a
+    # cell of such a world is stored once, so every ordering of levers that reaches it shares the entry.
+    # Values do not depend on where the player is, so the table survives turns until the observer reports
+    # a change to the model.
+    def __init__(self, bot, max_depth=8, max_nodes=2000):
+        self.bot = bot
+        self.metrics = bot.metrics
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.table = {}
+        self.model = None
+        self.changed_groups = ()
+        self.moved_groups = ()
+        self.nodes = 0
+        self.on_path = set()
+        self.distances = DistanceMatrix(bot)
+
+    def prepare(self):
+        bot = self.bot
+        model = (bot.observer.version,
+                 tuple(bot.flags),
+                 tuple(shift.signature() for shift in bot.shifts))
+        if model != self.model:
+            self.model = model
+            self.table = {}
+        self.changed_groups = tuple(sorted({shift.target_group for shift in bot.shifts
+                                            if shift.type == ShiftType.CHANGE}))
+        self.moved_groups = tuple(sorted({group for shift in bot.shifts if shift.type == ShiftType.TRANSFORM
+                                          for group in (shift.preshift, shift.postshift)}))
+        self.nodes = 0
+        self.on_path = set()
+
+    def state(self):
+        groups = self.bot.groups
+        board = self.bot.board
+        return (tuple(groups[gid].packed() if gid in groups else None for gid in self.changed_groups),
+                tuple(board.members(gid) for gid in self.moved_groups))
+
+    def applicable(self, shift):
+        groups = self.bot.groups
+        if shift.type == ShiftType.TRANSFORM:
+            return self.bot.board.members(shift.preshift) != 0
+        if shift.type == ShiftType.CHANGE:
+            group = groups[shift.target_group]
+            return (shift.target_change in ["kills", "unpassable"] and group[shift.target_change] == True) or \
+                   (shift.target_change in ["win"] and group[shift.target_change] == False)
+        return False
+
+    @timed('shift_search')
+    def plan(self, cx, cy):
+        # best lever sequence from the player's cell, measured with the queries of the current turn; when
+        # the clock's stage deadline passes the levers not tried yet are skipped and the best plan found so
+        # far is returned
+        self.prepare()
+        result, _ = self.expand(cx, cy, 0)
+        return result
+
+    def value(self, x, y, depth):
+        # what standing on (x, y) is worth once the levers on the path so far have been pulled
+        key = (self.state(), x, y)
+        if key in self.table:
+            return self.table[key], True
+        if key in self.on_path:
+            return NO_PLAN, False
+
+        bot = self.bot
+        bot.queries = TurnQueries(bot, (x, y))
+        ln, dir, _ = bot.attempt_flag()
+        if ln >= 0:
+            result, exact = (ln, dir, True), True
+        else:
+            ln, dir, _ = bot.attempt_explore()
+            if ln >= 0:
+                result, exact = (ln, dir, False), True
+            else:
+                self.on_path.add(key)
+                result, exact = self.expand(x, y, depth)
+                self.on_path.discard(key)
+
+        if exact:
+            self.table[key] = result
+        return result, exact
+
+    def expand(self, cx, cy, depth):
+        # bot.queries is rooted at (cx, cy) and describes the world before any of the candidate levers.
+        # Below the root (cx, cy) is a lever and only lengths matter, those come from the distance matrix.
+        # A lever is measured before its shift is applied, since the shift may open or close the way to it
+        bot = self.bot
+        queries = bot.queries
+        mn = 9999999
+        used_dir = 'PASS'
+        found_flag = False
+        exact = True
+        debug = log.enabled(DEBUG)
+        for shift in bot.shifts:
+            if not self.applicable(shift):
+                continue
+            lx, ly = shift.lever_position
+            if depth == 0:
+                # levers outside the player's component cost no search
+                if not queries.reachable(lx, ly):
+                    continue
+                dist, dir, _ = queries.path_to(lx, ly)
+            else:
+                dist, dir = self.distances.distance((cx, cy), (lx, ly)), 'PASS'
+            if dist < 0:
+                continue
+            if depth >= self.max_depth or self.nodes >= self.max_nodes or bot.clock.stage_expired():
+                exact = False
+                continue
+
+            self.nodes += 1
+            if debug:
+                log.debug("applying: %s", shift.copy())
+            before = mark(bot)
+            bot.apply_shift(shift)
+            (ans, _, flag), sub_exact = self.value(lx, ly, depth + 1)
+            if debug:
+                log.debug("errasing: %s", shift.copy())
+            rewind(bot, before)
+            bot.queries = queries
+            exact = exact and sub_exact
+
+            if 0 <= ans:
+                if (flag and not found_flag) or (flag == found_flag and ans + dist < mn):
+                    mn = ans + dist
+                    used_dir = dir
+                    found_flag = flag
+                    if dist == 0:
+                        used_dir = "USE"
+
+        if mn >= 9999999:
+            return NO_PLAN, exact
+        return (mn, used_dir, found_flag), exact
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+from collections import deque
+
+# KEKE_LOG_LEVEL=debug|info|warning  lowest level kept in the ring (default info)
+# KEKE_LOG=<path>                    append flushed records there instead of stderr
+# KEKE_LOG_SIZE=<n>                  records kept between flushes (default 4096)
+LEVEL_ENV = 'KEKE_LOG_LEVEL'
+PATH_ENV = 'KEKE_LOG'
+SIZE_ENV = 'KEKE_LOG_SIZE'
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+LEVEL_NAMES = {DEBUG: 'debug', INFO: 'info', WARNING: 'warning'}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+
+class RingLog(object):
+    # records are kept as (level, turn, format, args) and only formatted when flushed, so a message below
+    # the level costs a comparison and one above it a tuple; the ring drops the oldest records when full.
+    # args are formatted as they are at flush time, copy anything that will change and must be shown as
+    # it was
+    def __init__(self, level=INFO, size=4096, path=None):
+        self.level = level
+        self.records = deque(maxlen=size)
+        self.path = path
+        self.turn = 0
+
+    def enabled(self, level):
+        # for hot loops: skip building the arguments at all
+        return level >= self.level
+
+    def debug(self, message, *args):
+        if DEBUG >= self.level:
+            self.records.append((DEBUG, self.turn, message, args))
+
+    def info(self, message, *args):
+        if INFO >= self.level:
+            self.records.append((INFO, self.turn, message, args))
+
+    def warning(self, message, *args):
+        if WARNING >= self.level:
+            self.records.append((WARNING, self.turn, message, args))
+
+    def lines(self):
+        for level, turn, message, args in self.records:
+            if args:
+                message = message % args
+            yield f"[{turn}] {LEVEL_NAMES[level]}: {message}\n"
+
+    def flush(self, reason=None):
+        # writes out and empties the ring; called on death, on reset and on request
+        if not self.records:
+            return
+        if reason is not None:
+            self.records.append((INFO, self.turn, "log flushed on %s at %s", (reason, time.strftime('%H:%M:%S'))))
+        if self.path is None:
+            sys.stderr.writelines(self.lines())
+            sys.stderr.flush()
+        else:
+            with open(self.path, 'a') as f:
+                f.writelines(self.lines())
+        self.records.clear()
+
+
+def from_env():
+    level = LEVELS.get(os.environ.get(LEVEL_ENV, 'info').lower(), INFO)
+    size = int(os.environ.get(SIZE_ENV, 4096))
+    return RingLog(level, size, os.environ.get(PATH_ENV))
+
+
+log = from_env()
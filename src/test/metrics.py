@@ -0,0 +1,134 @@
+import os
+import time
+from functools import wraps
+
+# KEKE_SUMMARY=<path>  write the per-game json summary there on exit, death and win
+# KEKE_PROFILE=<path>  run the game under cProfile and dump the stats there at the same moments
+SUMMARY_ENV = 'KEKE_SUMMARY'
+PROFILE_ENV = 'KEKE_PROFILE'
+
+profile = None
+
+# upper bounds of the histogram buckets, in milliseconds; the last bucket takes everything above
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100)
+
+
+class Histogram(object):
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        i = 0
+        while i < len(BUCKETS) and ms > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.n += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def as_dict(self):
+        return {'n': self.n, 'total_ms': round(self.total, 3), 'max_ms': round(self.max, 3),
+                'buckets_ms': list(BUCKETS) + ['inf'], 'counts': self.counts}
+
+
+def timed(name):
+    # times a method of an object with a .metrics into the search histogram `name`
+    def decorate(method):
+        @wraps(method)
+        def timed_method(self, *args, **kwargs):
+            start = time.perf_counter()
+            result = method(self, *args, **kwargs)
+            self.metrics.search(name, time.perf_counter() - start)
+            return result
+        return timed_method
+    return decorate
+
+
+class Metrics(object):
+    # wall time of every make_move stage and search call, plus call and node counts per turn
+    def __init__(self, width, height, turn_limit):
+        self.info = {'width': width, 'height': height, 'turn_limit': turn_limit}
+        self.stages = {}
+        self.searches = {}
+        self.calls = {}
+        # cells popped by any search this turn, the searches add to it themselves
+        self.nodes = 0
+        # distance field cache lookups over the game
+        self.field_hits = 0
+        self.field_misses = 0
+        self.field_repairs = 0
+        # moves played from a kept plan, and plans dropped because something they relied on changed
+        self.plan_hits = 0
+        self.plan_replans = 0
+        self.turns = []
+        self.deaths = 0
+        self.resets = 0
+        self.path = os.environ.get(SUMMARY_ENV)
+
+    def search(self, name, seconds):
+        if name not in self.searches:
+            self.searches[name] = Histogram()
+        self.searches[name].add(seconds * 1000)
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def end_turn(self, clock, dir):
+        for name, seconds in clock.stage_times:
+            if name not in self.stages:
+                self.stages[name] = Histogram()
+            self.stages[name].add(seconds * 1000)
+        turn, stage, ms_left = clock.history[-1]
+        self.turns.append({'turn': turn, 'action': dir, 'stage': stage, 'ms_left': ms_left,
+                           'calls': self.calls, 'nodes': self.nodes})
+        self.calls = {}
+        self.nodes = 0
+
+    def summary(self, outcome):
+        ms_left = [turn['ms_left'] for turn in self.turns]
+        return {'outcome': outcome,
+                'map': self.info,
+                'turns': len(self.turns),
+                'deaths': self.deaths,
+                'resets': self.resets,
+                'fields': {'hits': self.field_hits, 'misses': self.field_misses, 'repairs': self.field_repairs},
+                'plans': {'hits': self.plan_hits, 'replans': self.plan_replans},
+                'min_ms_left': min(ms_left) if ms_left else None,
+                'stages': {name: hist.as_dict() for name, hist in self.stages.items()},
+                'searches': {name: hist.as_dict() for name, hist in self.searches.items()},
+                'per_turn': self.turns}
+
+    def write(self, outcome):
+        # rewritten on every event, the referee may kill us on a win or a loss without closing stdin
+        dump_profile()
+        if self.path is None:
+            return
+        import json
+        with open(self.path, 'w') as f:
+            json.dump(self.summary(outcome), f)
+
+
+def start_profile():
+    global profile
+    if not os.environ.get(PROFILE_ENV):
+        return
+    import cProfile
+    profile = cProfile.Profile()
+    profile.enable()
+
+
+def dump_profile():
+    # dump_stats stops the profiler, so it is switched back on for the rest of the game
+    if profile is not None:
+        profile.dump_stats(os.environ[PROFILE_ENV])
+        profile.enable()
+
+
+def stop_profile():
+    global profile
+    if profile is not None:
+        profile.disable()
+        profile.dump_stats(os.environ[PROFILE_ENV])
+        profile = None
@@ -0,0 +1,100 @@
+from enum import IntEnum
+
+# the properties the bot learns about every group, in the order the old dicts iterated them
+PROPS = ('interactive', 'win', 'blocks_vision', 'unpassable', 'kills')
+BITS = {prop: 1 << i for i, prop in enumerate(PROPS)}
+INTERACTIVE = BITS['interactive']
+WIN = BITS['win']
+BLOCKS_VISION = BITS['blocks_vision']
+UNPASSABLE = BITS['unpassable']
+KILLS = BITS['kills']
+ALL = (1 << len(PROPS)) - 1
+# what decides where a path may go
+PATHING = UNPASSABLE | KILLS
+
+
+class GroupProps(object):
+    # tri-state properties of one group in two small ints: a property's bit in `known` is set once it was
+    # observed and the same bit of `value` holds it. Indexing by name still reads -1 / True / False.
+    __slots__ = ('known', 'value')
+
+    def __init__(self, known=0, value=0):
+        self.known = known
+        self.value = value
+
+    def __getitem__(self, prop):
+        bit = BITS[prop]
+        if not self.known & bit:
+            return -1
+        return bool(self.value & bit)
+
+    def __setitem__(self, prop, status):
+        bit = BITS[prop]
+        if status is not True and status == -1:
+            self.known &= ~bit
+            self.value &= ~bit
+        elif status:
+            self.known |= bit
+            self.value |= bit
+        else:
+            self.known |= bit
+            self.value &= ~bit
+
+    def __iter__(self):
+        return iter(PROPS)
+
+    def __repr__(self):
+        return repr({prop: self[prop] for prop in PROPS})
+
+    def copy(self):
+        return GroupProps(self.known, self.value)
+
+    def packed(self):
+        return self.known << len(PROPS) | self.value
+
+    def pathing(self):
+        return (self.known & PATHING) << len(PROPS) | self.value & PATHING
+
+    def unknown(self, bits=ALL):
+        # the bits among `bits` not observed yet
+        return bits & ~self.known
+
+
+class ShiftType(IntEnum):
+    UNKNOWN = 0
+    CHANGE = 1
+    TRANSFORM = 2
+
+
+class Shift(object):
+    # what pulling one lever does, as far as the bot knows. Copies of it go on Bot.shift_history as the
+    # undo log, each holding only what the application changed: the target group's properties before it
+    # (stored_group) or the cells a transform moved (stored_targets).
+    __slots__ = ('id', 'type', 'target_group', 'target_change', 'stored_targets', 'preshift', 'postshift',
+                 'stored_group', 'lever_position')
+
+    def __init__(self, id=-2, lever_position=(-1, -1)):
+        self.id = id
+        self.type = ShiftType.UNKNOWN
+        self.target_group = -2
+        self.target_change = ""
+        self.stored_targets = 0
+        self.preshift = -2
+        self.postshift = -2
+        self.stored_group = None
+        self.lever_position = lever_position
+
+    def copy(self):
+        shift = Shift.__new__(Shift)
+        for slot in Shift.__slots__:
+            setattr(shift, slot, getattr(self, slot))
+        return shift
+
+    def signature(self):
+        return (self.type, self.target_group, self.target_change, self.preshift, self.postshift,
+                self.lever_position)
+
+    def __repr__(self):
+        return (f"Shift(id={self.id}, type={self.type.name}, target_group={self.target_group}, "
+                f"target_change={self.target_change!r}, preshift={self.preshift}, postshift={self.postshift}, "
+                f"lever_position={self.lever_position})")
@@ -0,0 +1,106 @@
+from world import pathing
+
+# sits between the stdin parser and Bot.parse_vision: remembers what was visible last turn and only hands
+# the model the cells that can still teach it something. It also keeps what each update changed in the
+# model, for the caches built on it: they take a stamp of the model they are in sync with and ask changed()
+# which cells to look at again, instead of each keeping and diffing a copy of the board.
+
+
+class Stamp(object):
+    # a model as a Grid snapshot, the groups' pathing() and the bot's versions
+    __slots__ = ('board', 'pathing', 'versions')
+
+    def __init__(self, bot):
+        self.board = bot.board.snapshot()
+        self.pathing = pathing(bot.groups)
+        self.versions = (bot.board_version, bot.groups_version)
+
+
+class Observer(object):
+    def __init__(self, bot):
+        self.bot = bot
+        self.previous = {}
+        self.props = {gid: group.packed() for gid, group in bot.groups.items()}
+        # the model as of the last update and as of the one before
+        self.current = Stamp(bot)
+        self.last = None
+        # what the last update changed: cells that hold another group, groups whose properties changed, and
+        # the cells walked on differently, those two with every cell of a group whose pathing changed
+        self.dirty_cells = 0
+        self.dirty_groups = set()
+        self.dirty = 0
+        # bumped by every update that changed the model, for caches keyed on the model
+        self.version = 0
+
+    def stale(self, x, y, record):
+        # a cell seen unchanged still has to be parsed when the model disagrees with it (a reset or a lever
+        # moved it), when its group's properties were touched since the last turn, or while its group's
+        # 'blocks_vision' is unknown, since that inference depends on the player's position and on which
+        # neighbours are visible
+        bot = self.bot
+        if self.previous.get((x, y)) != record:
+            return True
+        group = record[0]
+        if bot.board.get(x, y) != group:
+            return True
+        props = bot.groups[group]
+        return props['blocks_vision'] == -1 or self.props.get(group) != props.packed()
+
+    def update(self, obs):
+        # obs is the protocol.Observation of this turn
+        bot = self.bot
+        visible = obs.visible
+        current = {}
+        for x, y, group, interactive, win in zip(obs.xs, obs.ys, obs.groups, obs.interactive, obs.wins):
+            record = (group, interactive, win)
+            current[(x, y)] = record
+            if self.stale(x, y, record):
+                bot.parse_vision(visible, x, y, group, interactive != 0, win == 1)
+        self.previous = current
+        self.refresh()
+
+    def refresh(self):
+        bot = self.bot
+        board = bot.board
+        before = self.current
+        cells = board.changed_since(before.board)
+        self.dirty_cells = (1 << board.size) - 1 if cells is None else cells
+        props = {gid: group.packed() for gid, group in bot.groups.items()}
+        self.dirty_groups = {gid for gid in set(props) | set(self.props)
+                             if self.props.get(gid) != props.get(gid)}
+        self.props = props
+        dirty = self.dirty_cells
+        for gid in self.dirty_groups:
+            if (bot.groups[gid].pathing() if gid in bot.groups else None) != before.pathing.get(gid):
+                dirty |= board.members(gid)
+        self.dirty = dirty
+        self.last = before
+        self.current = self.stamp()
+        if self.dirty_cells or self.dirty_groups:
+            self.version += 1
+
+    def stamp(self):
+        # the live model, the last update's stamp while nothing that matters for pathing changed since
+        bot = self.bot
+        if self.current.versions == (bot.board_version, bot.groups_version):
+            return self.current
+        return Stamp(bot)
+
+    def changed(self, stamp):
+        # the cells that may be walked on differently in the live model than in stamp's, None once the
+        # board's history cannot tell
+        bot = self.bot
+        versions = (bot.board_version, bot.groups_version)
+        if stamp.versions == versions:
+            return 0
+        if stamp is self.last and self.current.versions == versions:
+            return self.dirty
+        board = bot.board
+        cells = board.changed_since(stamp.board)
+        if cells is None:
+            return None
+        groups = bot.groups
+        for gid in set(groups) | set(stamp.pathing):
+            if (groups[gid].pathing() if gid in groups else None) != stamp.pathing.get(gid):
+                cells |= board.members(gid)
+        return cells
@@ -0,0 +1,85 @@
+# Multi-turn plans: a stage that settled on a path of known, safe cells keeps it, and the turns after that
+# play its next move as long as nothing the path relies on has changed, instead of asking every stage
+# again. A plan relies on
+#   - its remaining cells, and the passability of their groups: checked against the cells the observer
+#     reports changed since the last turn the plan was checked on, the latest observation's dirty set;
+#   - the player standing where the last move should have taken it;
+#   - the lever log and what was inferred about its top shift, the flags known, deaths and resets;
+#   - for exploration, when flags are known but were out of reach, the whole board: any change may have
+#     opened the way to one, and getting the flag comes first.
+
+
+class Plan(object):
+    __slots__ = ('stage', 'steps', 'step', 'mask', 'stamp', 'tokens', 'whole_board')
+
+    def __init__(self, stage, steps, tokens, whole_board):
+        self.stage = stage
+        # (move, cell) pairs, steps[step] is the next one to play
+        self.steps = steps
+        self.step = 0
+        self.mask = 0
+        for _, idx in steps:
+            self.mask |= 1 << idx
+        self.tokens = tokens
+        self.whole_board = whole_board
+        # the Observer stamp of the model the plan was last checked on
+        self.stamp = None
+
+
+class PlanExecutor(object):
+    def __init__(self, bot):
+        self.bot = bot
+        self.metrics = bot.metrics
+        self.plan = None
+
+    def tokens(self):
+        # what the choice between stages rests on apart from the board
+        bot = self.bot
+        top = bot.shift_history[-1] if bot.shift_history else None
+        return (len(bot.shift_history), top and (top.type, top.target_change), len(bot.flags),
+                bot.metrics.deaths, bot.metrics.resets)
+
+    def start(self, stage, steps):
+        # keeps the path a stage is about to take the first move of
+        bot = self.bot
+        if not steps:
+            self.plan = None
+            return
+        plan = Plan(stage, steps, self.tokens(), stage != 'get flag' and len(bot.flags) > 0)
+        plan.stamp = bot.observer.stamp()
+        plan.step = 1
+        self.plan = plan
+
+    def valid(self, plan):
+        bot = self.bot
+        if plan.tokens != self.tokens():
+            return False
+        at = plan.steps[plan.step - 1][1]
+        if bot.board.index(bot.cx, bot.cy) != at:
+            return False
+        # the cells left to walk
+        plan.mask &= ~(1 << at)
+        dirty = bot.observer.changed(plan.stamp)
+        if dirty == 0:
+            return True
+        if plan.whole_board or dirty is None or dirty & plan.mask:
+            return False
+        plan.stamp = bot.observer.stamp()
+        return True
+
+    def next_move(self):
+        # (stage, move) of the plan in force, None once there is none and the stages have to choose
+        plan = self.plan
+        if plan is None:
+            return None
+        if plan.step >= len(plan.steps):
+            self.plan = None
+            return None
+        if not self.valid(plan):
+            self.plan = None
+            self.metrics.plan_replans += 1
+            return None
+        move = plan.steps[plan.step][0]
+        plan.step += 1
+        self.metrics.plan_hits += 1
+        return plan.stage, move
@@ -0,0 +1,127 @@
+from array import array
+from collections import OrderedDict
+
+from bitboard import group_mask, shifter
+from metrics import timed
+
+# strict-mode path lengths between the points of interest of a level (levers and flags), for shift_search:
+# below its first lever, every distance it needs runs from one lever to another and plans differ only in
+# the order the levers are pulled, so a table lookup replaces a search per branch
+
+UNREACHABLE = 0xFFFF
+
+
+class Row(object):
+    # a whole BFS from one point over the passable mask, the start always expanded. `examined` holds every
+    # cell whose passability the BFS looked at: a change anywhere else cannot alter the row.
+    __slots__ = ('layers', 'examined')
+
+    def __init__(self, shift, start, passable):
+        visited = 1 << start
+        frontier = visited
+        examined = visited
+        self.layers = [frontier]
+        while True:
+            around = shift.around(frontier)
+            examined |= around
+            frontier = around & passable & ~visited
+            if not frontier:
+                break
+            visited |= frontier
+            self.layers.append(frontier)
+        self.examined = examined
+
+    def distance(self, idx):
+        bit = 1 << idx
+        for d, layer in enumerate(self.layers):
+            if layer & bit:
+                return d
+        return UNREACHABLE
+
+
+class Table(object):
+    # the uint16 matrix of one world, row i column j is the length from points[i] to points[j]
+    def __init__(self, points, rows, stamp):
+        self.points = points
+        self.index = {idx: i for i, idx in enumerate(points)}
+        self.rows = rows
+        # the Observer stamp of the world the rows were searched in
+        self.stamp = stamp
+        n = len(points)
+        self.matrix = array('H', [UNREACHABLE]) * (n * n)
+        for i, idx in enumerate(points):
+            row = rows[idx]
+            for j, target in enumerate(points):
+                self.matrix[i * n + j] = row.distance(target)
+
+    def distance(self, source, target):
+        n = len(self.points)
+        return self.matrix[self.index[source] * n + self.index[target]]
+
+
+class DistanceMatrix(object):
+    # one Table per (board version, groups version, points), least recently used first out. A world not
+    # seen yet starts from the table built last, or the latest used the observer can still compare with,
+    # and only redoes the rows whose BFS examined a cell the observer reports changed between the two: a
+    # cell of another group, or of a group whose unpassable / kills knowledge changed. Revealing a corner of
+    # the map or flipping one group costs the rows that can see it.
+    def __init__(self, bot, size=32):
+        self.bot = bot
+        self.metrics = bot.metrics
+        self.size = size
+        self.tables = OrderedDict()
+        self.last = None
+
+    def points(self):
+        index = self.bot.board.index
+        cells = set(self.bot.known_levers) | set(self.bot.flags)
+        return tuple(sorted(index(x, y) for (x, y) in cells))
+
+    def table(self):
+        bot = self.bot
+        points = self.points()
+        key = (bot.board_version, bot.groups_version, points)
+        table = self.tables.get(key)
+        if table is not None:
+            self.tables.move_to_end(key)
+            return table
+        table = self.build(points)
+        self.tables[key] = table
+        if len(self.tables) > self.size:
+            self.tables.popitem(last=False)
+        self.last = table
+        return table
+
+    @timed('poi_matrix')
+    def build(self, points):
+        bot = self.bot
+        board = bot.board
+        passable, _ = bot.traversal()
+        mask = group_mask(board, passable)
+        shift = shifter(board.width, board.height)
+        rows = {}
+        last, dirty = self.base()
+        for idx in points:
+            row = last.rows.get(idx) if last is not None else None
+            if row is None or row.examined & dirty:
+                row = Row(shift, idx, mask)
+                self.metrics.nodes += len(row.layers)
+            rows[idx] = row
+        return Table(points, rows, bot.observer.stamp())
+
+    def base(self):
+        # (table, cells changed since it) to reuse rows from, (None, -1) for none
+        observer = self.bot.observer
+        candidates = [self.last] if self.last is not None else []
+        candidates += [table for table in reversed(self.tables.values()) if table is not self.last]
+        for table in candidates:
+            dirty = observer.changed(table.stamp)
+            if dirty is not None:
+                return table, dirty
+        return None, -1
+
+    def distance(self, source, target):
+        # strict path length between two points of interest, given as (x, y), or -1
+        index = self.bot.board.index
+        d = self.table().distance(index(*source), index(*target))
+        return -1 if d == UNREACHABLE else d
@@ -0,0 +1,160 @@
+import sys
+import time
+from array import array
+
+# the referee's per-turn observation, read straight off the binary stdin:
+#   N px py
+#   x y PROP[,PROP...]      N times, the lines of one cell are consecutive
+# PROP is OBJECT_TYPE:<template>, WIN_POINT, INTERACT:? or INTERACT:<template>
+
+OBJECT_TYPE = ord('O')
+WIN_POINT = ord('W')
+INTERACT = ord('I')
+UNKNOWN = ord('?')
+
+LEVER_GROUP = 9999
+NO_GROUP = -2
+# values of the interactive column: nothing to use, a lever whose target is not known yet ('?'),
+# otherwise the template the lever changes
+NOT_INTERACTIVE = 0
+INTERACT_UNKNOWN = -1
+
+CHUNK = 1 << 16
+
+# a map only ever shows a handful of distinct property strings and coordinates, so their parses are kept
+PROPS = {}
+NUMBERS = {str(i).encode(): i for i in range(1024)}
+
+
+class Observation(object):
+    # one turn, one record per visible cell in the order the referee sent them, kept as parallel arrays
+    def __init__(self, sx, sy):
+        self.sx = sx
+        self.sy = sy
+        self.xs = array('i')
+        self.ys = array('i')
+        self.groups = array('i')
+        self.interactive = array('i')
+        self.wins = array('b')
+        self.visible = set()
+        # monotonic time the turn's first line was in hand, where the turn's time budget starts
+        self.received = None
+
+    def __len__(self):
+        return len(self.xs)
+
+    def lever_target(self):
+        # template id the lever under the player reports, 0 when there is none or it is still '?'
+        for i in range(len(self.xs)):
+            if self.xs[i] == self.sx and self.ys[i] == self.sy:
+                return max(self.interactive[i], 0)
+        return 0
+
+
+def parse_props(props):
+    # (group, interactive, win) of one line
+    parsed = PROPS.get(props)
+    if parsed is not None:
+        return parsed
+    group = NO_GROUP
+    interactive = NOT_INTERACTIVE
+    win = 0
+    for prop in props.split(b','):
+        kind = prop[0]
+        if kind == OBJECT_TYPE:
+            group = int(prop[12:])
+        elif kind == WIN_POINT:
+            win = 1
+        elif kind == INTERACT:
+            interactive = INTERACT_UNKNOWN if prop[9] == UNKNOWN else int(prop[9:])
+    parsed = PROPS[props] = (group, interactive, win)
+    return parsed
+
+
+def parse_cells(lines, sx, sy):
+    # folds the lines of every cell into one record: an interactive line always wins (as the lever
+    # group), otherwise the highest group does, and the chosen line brings its win flag along
+    obs = Observation(sx, sy)
+    xs = obs.xs
+    ys = obs.ys
+    groups = obs.groups
+    interactives = obs.interactive
+    wins = obs.wins
+    visible = obs.visible
+    props_cache = PROPS
+    numbers = NUMBERS
+    prev_x = None
+    prev_y = None
+    for line in lines:
+        x, y, props = line.split(b' ', 2)
+        parsed = props_cache.get(props)
+        if parsed is None:
+            parsed = parse_props(props)
+        group, interactive, win = parsed
+        if x != prev_x or y != prev_y:
+            prev_x = x
+            prev_y = y
+            cx = numbers.get(x)
+            if cx is None:
+                cx = int(x)
+            cy = numbers.get(y)
+            if cy is None:
+                cy = int(y)
+            xs.append(cx)
+            ys.append(cy)
+            visible.add((cx, cy))
+            if interactive:
+                group = LEVER_GROUP
+            elif group == NO_GROUP:
+                win = 0
+            groups.append(group)
+            interactives.append(interactive)
+            wins.append(win)
+        elif interactive or group > groups[-1]:
+            groups[-1] = LEVER_GROUP if interactive else group
+            interactives[-1] = interactive
+            wins[-1] = win
+    return obs
+
+
+class Reader(object):
+    # pulls whatever the pipe has in one read and splits it into lines; the referee waits for our move
+    # before sending more, so a turn never blocks on bytes that are not coming
+    def __init__(self, stream=None):
+        if stream is None:
+            stream = sys.stdin.buffer
+        self.read = stream.read1 if hasattr(stream, 'read1') else stream.read
+        self.lines = []
+        self.pos = 0
+        self.tail = b''
+        # a list every line taken is appended to, for a transcript
+        self.tap = None
+
+    def fill(self):
+        chunk = self.read(CHUNK)
+        if not chunk:
+            raise EOFError
+        lines = (self.tail + chunk).split(b'\n')
+        self.tail = lines.pop()
+        self.lines = self.lines[self.pos:] + lines
+        self.pos = 0
+
+    def take(self, n):
+        while len(self.lines) - self.pos < n:
+            self.fill()
+        lines = self.lines[self.pos:self.pos + n]
+        self.pos += n
+        if self.tap is not None:
+            self.tap.extend(lines)
+        return lines
+
+    def read_header(self):
+        # W H turnLimit
+        return [int(i) for i in self.take(1)[0].split()]
+
+    def read_turn(self):
+        n, sx, sy = [int(i) for i in self.take(1)[0].split()]
+        received = time.monotonic()
+        obs = parse_cells(self.take(n), sx, sy)
+        obs.received = received
+        return obs
@@ -0,0 +1,277 @@
+from array import array
+
+from bitboard import BitboardTree
+from fields import DistanceField
+from grid import DIRECTIONS, iter_bits
+from metrics import timed
+from model import KILLS, UNPASSABLE
+
+STRICT = 0
+UNDISCOVERED = 1
+FOG = 2
+# the tier of a path through a group known to kill, never one of the modes
+DEADLY = 3
+
+# mode -> (undiscovered_traversal, fog_traversal), the switches Bot.traversal takes
+MODES = {STRICT: (False, False), UNDISCOVERED: (True, False), FOG: (True, True)}
+
+# KEKE_SEARCH=queue|bitboard  which search backend the bot's trees use (default queue)
+SEARCH_ENV = 'KEKE_SEARCH'
+QUEUE = 'queue'
+BITBOARD = 'bitboard'
+
+
+def has_unknown(group):
+    return group.unknown() != 0
+
+
+def worth_probing(group):
+    # groups whose cells are worth walking up to for a look; whether a wall kills does not matter
+    unknown = group.unknown()
+    if group.value & UNPASSABLE:
+        unknown &= ~KILLS
+    return unknown != 0
+
+
+def risk_tier(gid, group):
+    # the cheapest traversal mode that may walk through the group's cells, DEADLY for known killers and -1
+    # for walls
+    known = group.known & group.value
+    if gid < -1 or known & UNPASSABLE:
+        return -1
+    if known & KILLS:
+        return DEADLY
+    if gid == -1:
+        return FOG
+    if group.unknown(UNPASSABLE | KILLS):
+        return UNDISCOVERED
+    return STRICT
+
+
+class SearchTree(object):
+    # BFS from the player over one traversal mode; cells that can be looked at but not walked through
+    # (fog and groups with unknown properties in strict mode) are kept as leaves. The tree is grown only
+    # as far as the queries asked so far needed, so an early answer costs as little as an early exit.
+    def __init__(self, board, start, passable, leaf, risky, metrics):
+        self.board = board
+        self.metrics = metrics
+        self.passable = passable
+        self.leaf_groups = leaf
+        self.risky = risky
+        self.dist = array('i', [-1]) * board.size
+        self.first = ['PASS'] * board.size
+        self.obstacle = array('i', [0]) * board.size
+        self.leaf = bytearray(board.size)
+        self.dist[start] = 0
+        self.order = [start]
+        self.head = 0
+
+    def expand(self):
+        # pops the next queued cell; False once the whole reachable region is settled
+        order = self.order
+        if self.head >= len(order):
+            return False
+        idx = order[self.head]
+        self.head += 1
+        self.metrics.nodes += 1
+        if self.leaf[idx]:
+            return True
+
+        board = self.board
+        width = board.width
+        height = board.height
+        cells = board.cells
+        dist = self.dist
+        first = self.first
+        obstacle = self.obstacle
+        g = dist[idx]
+        cx = idx % width
+        cy = idx // width
+        for (dx, dy, move) in DIRECTIONS:
+            tx = cx + dx
+            ty = cy + dy
+            if not (0 <= tx < width and 0 <= ty < height):
+                continue
+            tidx = ty * width + tx
+            if dist[tidx] >= 0:
+                continue
+            gid = cells[tidx]
+            if not self.passable[gid]:
+                if not self.leaf_groups[gid]:
+                    continue
+                self.leaf[tidx] = 1
+            dist[tidx] = g + 1
+            first[tidx] = move if g == 0 else first[idx]
+            obstacle[tidx] = obstacle[idx] or (gid if self.risky[gid] else 0)
+            order.append(tidx)
+        return True
+
+    def walk(self):
+        # cells in BFS order, growing the tree on demand
+        i = 0
+        while True:
+            while i >= len(self.order):
+                if not self.expand():
+                    return
+            yield self.order[i]
+            i += 1
+
+    def reach(self, idx):
+        while self.dist[idx] < 0 and self.expand():
+            pass
+        return self.dist[idx] >= 0
+
+    def is_leaf(self, idx):
+        return self.leaf[idx] == 1
+
+    def answer(self, idx):
+        return self.dist[idx], self.first[idx], self.obstacle[idx]
+
+    def nearest(self, mask, leaves=True):
+        # the first cell of the bitset `mask` in BFS order
+        leaf = self.leaf
+        for idx in self.walk():
+            if mask >> idx & 1 and (leaves or not leaf[idx]):
+                return self.answer(idx)
+        return -1, 'PASS', 0
+
+
+def risk_costs(groups, unit, max_tier=DEADLY):
+    # the price of stepping onto each group's cells for a risk DistanceField: (deadly, fog, unknown, 1) by
+    # the group's risk_tier, packed into one int with a digit of `unit` per component, so summed costs
+    # compare lexicographically. The cheapest path is then the one of the lowest tier that has any, with
+    # the fewest risky cells first. Groups above max_tier are left out as walls.
+    costs = {}
+    for gid, group in groups.items():
+        tier = risk_tier(gid, group)
+        if 0 <= tier <= max_tier:
+            costs[gid] = 1 + (unit ** tier if tier > STRICT else 0)
+    return costs
+
+
+def cost_tier(cost, unit):
+    for tier in (DEADLY, FOG, UNDISCOVERED):
+        if cost >= unit ** tier:
+            return tier
+    return STRICT
+
+
+def risky_groups(groups):
+    # the groups reported as a path's obstacle
+    return {gid: gid > 0 and (group['kills'] == -1 or group['unpassable'] == -1) for gid, group in groups.items()}
+
+
+class TurnQueries(object):
+    # every make_move question asked from one cell (the player's unless told otherwise), answered from
+    # one tree per traversal mode
+    def __init__(self, bot, origin=None):
+        self.bot = bot
+        self.metrics = bot.metrics
+        if origin is None:
+            origin = (bot.cx, bot.cy)
+        self.start = bot.board.index(origin[0], origin[1])
+        self.trees = {}
+
+    def tree(self, mode):
+        if mode not in self.trees:
+            bot = self.bot
+            passable, _ = bot.traversal(*MODES[mode])
+            leaf = {gid: mode == STRICT and worth_probing(group) for gid, group in bot.groups.items()}
+            risky = risky_groups(bot.groups)
+            tree = BitboardTree if bot.search_backend == BITBOARD else SearchTree
+            self.trees[mode] = tree(bot.board, self.start, passable, leaf, risky, self.metrics)
+        return self.trees[mode]
+
+    def field(self, kind, goals, costs, charge_goal=True, ordered=True):
+        # the cached DistanceField of the goal cells under the cost table kind names; costs builds the
+        # table on a miss
+        bot = self.bot
+        goals = tuple(goals)
+        family = (kind, goals if ordered else None, charge_goal, ordered)
+        model = (None if ordered else goals, bot.board_version, bot.groups_version)
+        return bot.fields.get(family, model, bot.observer, goals,
+                              lambda: (costs(), risky_groups(bot.groups)),
+                              lambda costs, risky: DistanceField(bot.board, goals, costs, risky, self.metrics,
+                                                                 charge_goal, ordered))
+
+    def mode_costs(self, mode):
+        passable, _ = self.bot.traversal(*MODES[mode])
+        return {gid: 1 for gid, flag in passable.items() if flag}
+
+    def reachable(self, x, y, mode=STRICT):
+        # whether any path of the mode leads from the start onto (x, y), without a search
+        return self.bot.connectivity.reachable(mode, self.start, self.bot.board.index(x, y))
+
+    @timed('path_to')
+    def path_to(self, x, y, mode=STRICT):
+        tree = self.tree(mode)
+        idx = self.bot.board.index(x, y)
+        if not tree.reach(idx) or tree.is_leaf(idx):
+            return -1, 'PASS', 0
+        return tree.answer(idx)
+
+    @timed('nearest_goal')
+    def nearest_goal(self, goals, mode=STRICT):
+        # goals are (x, y) cells in priority order; (length, first move, obstacle, goal) of the nearest one,
+        # ties going to the earlier goal
+        if not goals:
+            return -1, 'PASS', 0, None
+        board = self.bot.board
+        field = self.field(mode, [board.index(x, y) for (x, y) in goals], lambda: self.mode_costs(mode))
+        ln, dir, obstacle, idx = field.answer(self.start)
+        return ln, dir, obstacle, board.coords(idx) if idx >= 0 else None
+
+    def risk_field(self, cells, charge_goal=True, ordered=True, max_tier=FOG):
+        bot = self.bot
+        unit = bot.board.size + 1
+        return self.field(('risk', max_tier), cells, lambda: risk_costs(bot.groups, unit, max_tier),
+                          charge_goal, ordered)
+
+    def risk_answer(self, cells, charge_goal=True, ordered=True, max_tier=FOG):
+        # (length, first move, obstacle, goal cell, tier) of the path of the lowest tier to any of the goal
+        # cells, from one field instead of one tree per mode
+        unit = self.bot.board.size + 1
+        cost, dir, obstacle, idx = self.risk_field(cells, charge_goal, ordered, max_tier).answer(self.start)
+        if idx < 0:
+            return -1, 'PASS', 0, -1, STRICT
+        return cost % unit, dir, obstacle, idx, cost_tier(cost, unit)
+
+    @timed('safest_goal')
+    def safest_goal(self, goals, charge_goal=True, ordered=True, max_tier=FOG):
+        # risk_answer for (x, y) goals, the goal given back as (x, y)
+        board = self.bot.board
+        ln, dir, obstacle, idx, tier = self.risk_answer([board.index(x, y) for (x, y) in goals],
+                                                        charge_goal, ordered, max_tier)
+        return ln, dir, obstacle, board.coords(idx) if idx >= 0 else None, tier
+
+    @timed('nearest_frontier')
+    def nearest_frontier(self, max_tier=FOG):
+        # (length, first move, obstacle, frontier cluster, tier) of the safest way into the fog; stepping
+        # onto the frontier cell itself is free, the path there is not
+        frontier = self.bot.frontier
+        ln, dir, obstacle, idx, tier = self.risk_answer(list(iter_bits(frontier.sync())), charge_goal=False,
+                                                        ordered=False, max_tier=max_tier)
+        return ln, dir, obstacle, frontier.cluster_of(idx) if idx >= 0 else 0, tier
+
+    def safest_route(self, goals):
+        # the (move, cell) steps of safest_goal's path to the (x, y) goals
+        board = self.bot.board
+        return self.risk_field([board.index(x, y) for (x, y) in goals]).route(self.start)
+
+    def frontier_route(self):
+        # the (move, cell) steps of nearest_frontier's path
+        cells = list(iter_bits(self.bot.frontier.sync()))
+        return self.risk_field(cells, charge_goal=False, ordered=False).route(self.start)
+
+    @timed('nearest_group')
+    def nearest_group(self, group, mode=STRICT):
+        return self.tree(mode).nearest(self.bot.board.members(group), leaves=False)
+
+    @timed('nearest_undiscovered')
+    def nearest_undiscovered(self):
+        board = self.bot.board
+        mask = 0
+        for gid, group in self.bot.groups.items():
+            if has_unknown(group):
+                mask |= board.members(gid)
+        return self.tree(STRICT).nearest(mask)
@@ -0,0 +1,177 @@
+import argparse
+import copy
+import io
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from bot import Bot, observe
+from logs import PATH_ENV, log
+from protocol import Reader
+from transcript import turns
+
+# plays a transcript (KEKE_TRANSCRIPT) back into a fresh Bot and checks every answer against the recorded one:
+#   python replay.py game.transcript [--turn N] [--profile cprofile|sample] [--repeat K] [--budget SECONDS]
+# --turn stops after turn N, --profile runs that turn (observe and make_move) under cProfile or a sampling
+# profiler, over and over on copies of the bot as it was before the turn: K times with --repeat, otherwise
+# until PROFILE_SECONDS of it were profiled, a single turn is over before a sampler gets going. The bot's
+# deadlines, the turn's and the stages', are as good as gone unless --budget gives the turn one, so a slow
+# machine or the profiler does not change the answers; a turn the recorded bot cut short for time only
+# matches again with --budget 0.1, and only on a machine as fast. The log flushes on every death and reset
+# go nowhere unless KEKE_LOG names a file.
+
+NO_DEADLINE = 3600.0
+SAMPLE_INTERVAL = 0.0002
+PROFILE_SECONDS = 1.0
+
+
+class Sampler(object):
+    # a thread that looks at the replaying thread's stack every interval of wall time while a profiled turn
+    # runs, counting the functions on it: where the time is spent (self) and what it is spent under
+    # (total). The interpreter is told to switch threads about as often, or the sampler would only get the
+    # GIL every 5ms and a whole turn could pass without a sample
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.own = Counter()
+        self.total = Counter()
+        self.samples = 0
+        self.active = threading.Event()
+        self.target = None
+        self.thread = None
+        self.switch = None
+
+    def run(self):
+        while True:
+            self.active.wait()
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.target)
+            if self.active.is_set() and frame is not None:
+                self.sample(frame)
+
+    def sample(self, frame):
+        self.samples += 1
+        seen = set()
+        own = True
+        while frame is not None:
+            code = frame.f_code
+            name = f'{code.co_filename.rsplit("/", 1)[-1]}:{code.co_firstlineno}({code.co_name})'
+            if own:
+                self.own[name] += 1
+                own = False
+            if name not in seen:
+                seen.add(name)
+                self.total[name] += 1
+            frame = frame.f_back
+
+    def enable(self):
+        self.target = threading.get_ident()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        self.switch = sys.getswitchinterval()
+        sys.setswitchinterval(self.interval / 2)
+        self.active.set()
+
+    def disable(self):
+        self.active.clear()
+        sys.setswitchinterval(self.switch)
+
+    def print_stats(self, limit=25, out=sys.stdout):
+        print(f'{self.samples} samples every {self.interval * 1000:g}ms', file=out)
+        for title, counts in (('self', self.own), ('total', self.total)):
+            print(f'{title:>6}', file=out)
+            for name, n in counts.most_common(limit):
+                print(f'{n:6} {n * 100 / max(self.samples, 1):5.1f}%  {name}', file=out)
+
+
+def profile(profiler, bot, obs, header, repeat=None, seconds=PROFILE_SECONDS):
+    # plays the turn on copies of bot under the profiler; (runs, mean seconds per run)
+    runs = 0
+    spent = 0.0
+    while (runs < repeat) if repeat else (runs == 0 or spent < seconds):
+        trial, trial_obs = copy.deepcopy((bot, obs))
+        started = time.perf_counter()
+        profiler.enable()
+        observe(trial, trial_obs, *header).make_move()
+        profiler.disable()
+        spent += time.perf_counter() - started
+        runs += 1
+    return runs, spent / runs
+
+
+def replay(recorded, budget=None, stop=None, profiler=None, repeat=None, out=sys.stdout):
+    # (turns played, [(turn, recorded, replayed)] that differ); the profiler runs for turn stop only
+    reader = Reader(io.BytesIO(b''.join(data for data, _ in recorded)))
+    w, h, limit = reader.read_header()
+    bot = None
+    differ = []
+    turn = 0
+    while stop is None or turn < stop:
+        try:
+            obs = reader.read_turn()
+        except EOFError:
+            break
+        turn += 1
+        if bot is None:
+            bot = Bot(w, h, obs.sx, obs.sy, 4, limit)
+            if budget is None:
+                bot.clock.turn_budget = NO_DEADLINE
+                bot.clock.stage_budgets = dict.fromkeys(bot.clock.stage_budgets, NO_DEADLINE)
+            else:
+                bot.clock.turn_budget = budget
+        if profiler is not None and turn == stop:
+            runs, seconds = profile(profiler, bot, obs, (w, h, limit), repeat)
+            print(f'turn {turn}: {runs} runs of {seconds * 1000:.2f}ms', file=out)
+        bot = observe(bot, obs, w, h, limit)
+        move = bot.make_move()
+        answer = recorded[turn - 1][1]
+        if answer is None:
+            print(f'turn {turn} was never answered in the recording, {move} now', file=out)
+        elif answer != move:
+            differ.append((turn, answer, move))
+    return turn, differ
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='replay.py')
+    parser.add_argument('transcript')
+    parser.add_argument('--turn', type=int, help='stop after this turn')
+    parser.add_argument('--profile', choices=('cprofile', 'sample'), help='profile the last turn played')
+    parser.add_argument('--repeat', type=int,
+                        help=f'profile the turn this many times, {PROFILE_SECONDS:g}s worth by default')
+    parser.add_argument('--budget', type=float, help='seconds per turn, none by default')
+    parser.add_argument('--stats', help='dump the cProfile stats there')
+    args = parser.parse_args()
+
+    recorded = turns(args.transcript)
+    stop = args.turn if args.turn is not None else len(recorded)
+    profiler = None
+    if args.profile == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+    elif args.profile == 'sample':
+        profiler = Sampler()
+
+    if not os.environ.get(PATH_ENV):
+        log.path = os.devnull
+    played, differ = replay(recorded, args.budget, stop if profiler is not None or args.turn else None,
+                            profiler, args.repeat)
+    answered = sum(1 for _, answer in recorded[:played] if answer is not None)
+    for turn, answer, move in differ[:10]:
+        print(f'turn {turn}: recorded {answer}, replayed {move}')
+    print(f'{played} of {len(recorded)} turns replayed, {answered - len(differ)} of {answered} answers match')
+
+    if args.profile == 'cprofile':
+        import pstats
+        if args.stats:
+            profiler.dump_stats(args.stats)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+    elif args.profile == 'sample':
+        profiler.print_stats()
+    return 1 if differ else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,4 @@
+from .cases import TestCase, case_for, test_cases
+from .referee import CELLS, FIRST_TURN_MAX_TIME, LINES, TURN_MAX_TIME, GameResult, SubprocessAgent, play
+from .tmx import MapSpec, load_map
+from .world import World
@@ -0,0 +1,39 @@
+import argparse
+import os
+import sys
+
+from .cases import case_for, test_cases
+from .referee import TURN_MAX_TIME, SubprocessAgent, play
+
+# plays the bot through the referee's test cases without the JVM, one line per game:
+#   python -m simulator [case or map ...] [--bot bot.py] [--no-timeout]
+# run from src/test; cases are test names (test3), map names (map1) or .tmx paths, all test cases if none
+
+BOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bot.py')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m simulator')
+    parser.add_argument('cases', nargs='*')
+    parser.add_argument('--bot', default=BOT)
+    parser.add_argument('--turn-limit', type=int, help="instead of the test case's")
+    parser.add_argument('--no-timeout', action='store_true', help='wait for every answer')
+    args = parser.parse_args()
+
+    cases = [case_for(target) for target in args.cases] if args.cases else test_cases()
+    lost = 0
+    for case in cases:
+        result = play(case.spec(), SubprocessAgent([sys.executable, args.bot]),
+                      turn_limit=args.turn_limit or case.turn_limit,
+                      turn_time=None if args.no_timeout else TURN_MAX_TIME)
+        latencies = sorted(result.latencies[1:]) or [0.0]
+        outcome = 'won' if result.won else 'timeout' if result.timeout else 'crashed' if result.crashed else 'lost'
+        print(f'{case.name:7} {os.path.basename(case.map_path):14} {outcome:8} {result.turns:4}/{result.turn_limit:<4} '
+              f'deaths={result.deaths} resets={result.resets} '
+              f'p50={latencies[len(latencies) // 2] * 1000:.2f}ms max={latencies[-1] * 1000:.2f}ms')
+        lost += not result.won
+    return 1 if lost else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
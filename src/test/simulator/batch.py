@@ -0,0 +1,326 @@
+import numpy as np
+
+from .tmx import Static
+from .vision import visible_cells
+from .world import FLOOR, INTERACTIVE_GROUP, MOVES, WALL
+
+# World for many games at once, each game a row of stacked NumPy arrays, for sweeps that need far more steps
+# than one interpreter loop per game can give. Needs numpy, unlike the rest of the simulator, so it is not
+# imported by the package:
+#   from simulator.batch import BatchWorld
+#   batch = BatchWorld([spec] * 1024)
+#   batch.step(actions)     # one action code per game
+#   visible, groups, wins, levers = batch.view()
+#
+# A cell is the floor plus a fixed number of layers of group ids, EMPTY where a layer holds nothing; a
+# transform only ever swaps one entity for another, so the layers a map starts with are all it ever needs.
+# Every entity of a group carries its template's properties (a toggle flips both), so properties live per
+# game and group as bits. Levers are per game and lever, in declaration order, which is their order inside
+# a cell.
+#
+# Vision is the referee's shadowcasting, kept exact: what a player sees only depends on the blockers in the
+# (2r+1)^2 window around it and on where the map's edges cut that window, so the visible window is computed
+# once per such pattern and looked up from then on. A sweep over a handful of maps meets few patterns.
+
+PASS = 0
+LEFT = 1
+RIGHT = 2
+UP = 3
+DOWN = 4
+USE = 5
+RESET = 6
+ACTIONS = ('PASS', 'LEFT', 'RIGHT', 'UP', 'DOWN', 'USE', 'RESET')
+CODES = {name: code for code, name in enumerate(ACTIONS)}
+CODES['RE'] = RESET
+DX = np.array([0] + [MOVES[name][0] for name in ACTIONS[1:5]] + [0, 0], dtype=np.int32)
+DY = np.array([0] + [MOVES[name][1] for name in ACTIONS[1:5]] + [0, 0], dtype=np.int32)
+
+UNPASSABLE = 1
+KILLS = 2
+WIN = 4
+BLOCKS_VISION = 8
+BITS = {'unpassable': UNPASSABLE, 'kills': KILLS, 'win': WIN, 'blocks_vision': BLOCKS_VISION}
+
+# the interactive column of view(), as protocol.parse_cells has it
+NOT_INTERACTIVE = 0
+INTERACT_UNKNOWN = -1
+
+
+def encode(actions):
+    # action names, anything unknown is a PASS like in Engine.update
+    return np.array([CODES.get(action, PASS) for action in actions], dtype=np.int8)
+
+
+def bits(props):
+    value = 0
+    for prop in props:
+        value |= BITS[prop]
+    return value
+
+
+class Layout(object):
+    # one map's starting arrays, before padding
+    def __init__(self, spec):
+        self.width = spec.width
+        self.height = spec.height
+        self.spawn = spec.spawn
+        self.turn_limit = spec.turn_limit
+        self.templates = {FLOOR: 0, WALL: UNPASSABLE | BLOCKS_VISION}
+        for group, props in spec.templates.items():
+            self.templates[group] = bits(props)
+        self.transmutable = set(spec.templates)
+
+        stacks = [[] for _ in range(spec.width * spec.height)]
+        for (x, y) in spec.walls:
+            stacks[y * spec.width + x].append(WALL)
+        self.levers = []
+        for obj in spec.objects:
+            if isinstance(obj, Static):
+                stacks[obj.y * spec.width + obj.x].append(obj.group)
+            else:
+                self.levers.append(obj)
+        self.stacks = stacks
+        self.layers = max(len(stack) for stack in stacks)
+        self.groups = set(self.templates)
+        for lever in self.levers:
+            self.groups.add(lever.target)
+            if lever.transform is not None:
+                self.groups.add(lever.transform)
+
+
+class BatchWorld(object):
+    def __init__(self, specs, vision=4, turn_limits=None):
+        layouts = {}
+        games = []
+        for spec in specs:
+            if id(spec) not in layouts:
+                layouts[id(spec)] = Layout(spec)
+            games.append(layouts[id(spec)])
+        n = len(games)
+        self.n = n
+        self.vision = vision
+        self.width = np.array([game.width for game in games], dtype=np.int32)
+        self.height = np.array([game.height for game in games], dtype=np.int32)
+        self.turn_limit = np.array(turn_limits if turn_limits is not None else [game.turn_limit for game in games],
+                                   dtype=np.int32)
+        # boards are padded by the vision radius all round and to the largest map, so every window is on
+        # the board; the padding has nothing in it, not even floor
+        r = vision
+        w = int(self.width.max()) + 2 * r
+        h = int(self.height.max()) + 2 * r
+        layers = 1 + max(game.layers for game in games)
+        # group ids index the property table directly, EMPTY is its last column and has none
+        self.empty = max(max(game.groups) for game in games) + 1
+        g = self.empty + 1
+        k = max([len(game.levers) for game in games] + [1])
+
+        self.start_groups = np.full((n, h, w, layers), self.empty, dtype=np.int16)
+        self.start_props = np.zeros((n, g), dtype=np.uint8)
+        self.transmutable = np.zeros((n, g), dtype=bool)
+        self.start_x = np.array([game.spawn[0] for game in games], dtype=np.int32)
+        self.start_y = np.array([game.spawn[1] for game in games], dtype=np.int32)
+        # levers: position, target, transform (-1 for a toggle), toggled bit (0 for a transform) and whether
+        # a transform is into a group the map knows; games with fewer levers are padded with ones off the map
+        self.lever_x = np.full((n, k), -1, dtype=np.int32)
+        self.lever_y = np.full((n, k), -1, dtype=np.int32)
+        self.lever_target = np.zeros((n, k), dtype=np.int16)
+        self.lever_transform = np.full((n, k), -1, dtype=np.int16)
+        self.lever_toggle = np.zeros((n, k), dtype=np.uint8)
+        self.lever_valid = np.zeros((n, k), dtype=bool)
+        for i, game in enumerate(games):
+            self.start_groups[i, r:r + game.height, r:r + game.width, 0] = FLOOR
+            for idx, stack in enumerate(game.stacks):
+                for layer, group in enumerate(stack):
+                    self.start_groups[i, r + idx // game.width, r + idx % game.width, 1 + layer] = group
+            for group, value in game.templates.items():
+                self.start_props[i, group] = value
+                self.transmutable[i, group] = group in game.transmutable
+            for j, lever in enumerate(game.levers):
+                self.lever_x[i, j] = lever.x
+                self.lever_y[i, j] = lever.y
+                self.lever_target[i, j] = lever.target
+                if lever.transform is not None:
+                    self.lever_transform[i, j] = lever.transform
+                    self.lever_valid[i, j] = lever.transform in game.templates
+                else:
+                    self.lever_toggle[i, j] = BITS[lever.toggle]
+                    self.lever_valid[i, j] = True
+
+        self.rows = np.arange(n)
+        self.groups = self.start_groups.copy()
+        self.props = self.start_props.copy()
+        self.x = self.start_x.copy()
+        self.y = self.start_y.copy()
+        self.counter = np.zeros((n, k), dtype=np.int32)
+        self.alive = np.ones(n, dtype=bool)
+        self.turns = np.zeros(n, dtype=np.int32)
+        self.won = np.zeros(n, dtype=bool)
+        self.deaths = np.zeros(n, dtype=np.int32)
+        self.resets = np.zeros(n, dtype=np.int32)
+
+        # flat offsets of a window's cells from its top left corner and the visible windows seen so far, by
+        # pattern
+        self.window = (np.arange(2 * r + 1)[:, None] * w + np.arange(2 * r + 1)[None, :]).astype(np.intp)
+        self.patterns = {}
+        self.masks = []
+        self.mask_stack = np.zeros((0, 2 * r + 1, 2 * r + 1), dtype=bool)
+
+    def done(self):
+        return self.won | (self.turns >= self.turn_limit)
+
+    def reset(self, mask):
+        # builds the level again from the map for the games in mask, levers and templates included
+        self.groups[mask] = self.start_groups[mask]
+        self.props[mask] = self.start_props[mask]
+        self.x[mask] = self.start_x[mask]
+        self.y[mask] = self.start_y[mask]
+        self.counter[mask] = 0
+        self.alive[mask] = True
+
+    def restart(self, mask=None):
+        # a new game for the games in mask, every game when None: the level and the turn count
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+        self.reset(mask)
+        self.turns[mask] = 0
+        self.won[mask] = False
+        self.deaths[mask] = 0
+        self.resets[mask] = 0
+
+    def cell_props(self, xs, ys):
+        # the union of the properties of everything on each game's cell (xs[i], ys[i])
+        r = self.vision
+        h, w, layers = self.groups.shape[1:]
+        stack = self.groups.reshape(-1, layers).take((self.rows * h + ys + r) * w + xs + r, axis=0)
+        props = self.props[self.rows, stack[:, 0]]
+        for layer in range(1, layers):
+            props |= self.props[self.rows, stack[:, layer]]
+        return props
+
+    def step(self, actions):
+        # one turn of every game that is not done, World.step then World.after_turn; actions are codes
+        actions = np.asarray(actions)
+        live = ~self.done()
+        self.turns += live
+
+        resets = live & (actions == RESET)
+        if resets.any():
+            self.resets += resets
+            self.reset(resets)
+
+        moves = live & (actions >= LEFT) & (actions <= DOWN)
+        if moves.any():
+            tx = self.x + DX[actions]
+            ty = self.y + DY[actions]
+            moves &= (tx >= 0) & (tx < self.width) & (ty >= 0) & (ty < self.height)
+            # off the map the lookup is clamped and then ignored
+            target = self.cell_props(np.clip(tx, 0, self.width - 1), np.clip(ty, 0, self.height - 1))
+            moves &= (target & UNPASSABLE) == 0
+            self.x = np.where(moves, tx, self.x)
+            self.y = np.where(moves, ty, self.y)
+            self.alive &= ~(moves & ((target & KILLS) != 0))
+
+        uses = live & (actions == USE)
+        if uses.any():
+            self.use(uses)
+
+        self.won |= live & self.alive & ((self.cell_props(self.x, self.y) & WIN) != 0)
+        died = live & ~self.alive
+        if died.any():
+            self.deaths += died
+            self.reset(died)
+
+    def use(self, uses):
+        # every lever under the player, in their order in the cell, each seeing what the ones before did
+        hits = uses[:, None] & (self.lever_x == self.x[:, None]) & (self.lever_y == self.y[:, None])
+        self.counter += hits
+        rows = self.rows
+        for j in np.flatnonzero(hits.any(axis=0)):
+            hit = hits[:, j] & self.lever_valid[:, j]
+            target = self.lever_target[:, j]
+            transform = hit & (self.lever_transform[:, j] >= 0) & self.transmutable[rows, target]
+            if transform.any():
+                games = np.flatnonzero(transform)
+                block = self.groups[games]
+                self.groups[games] = np.where(block == target[games, None, None, None],
+                                              self.lever_transform[games, j, None, None, None], block)
+            toggle = hit & (self.lever_toggle[:, j] != 0)
+            if toggle.any():
+                games = np.flatnonzero(toggle)
+                self.props[games, target[games]] ^= self.lever_toggle[games, j]
+
+    def around(self):
+        # flat board indices of every player's (2r+1)^2 window and the groups of each layer there,
+        # [n, 2r+1, 2r+1, layers]
+        h, w, layers = self.groups.shape[1:]
+        # the window's top left corner is the player's cell on the padded board
+        corner = (self.rows * h + self.y) * w + self.x
+        cells = corner[:, None, None] + self.window
+        return cells, self.groups.reshape(-1, layers).take(cells, axis=0)
+
+    def visible(self):
+        # [n, 2r+1, 2r+1], the cells each player sees, centered on the player
+        return self.see(self.around()[1])
+
+    def see(self, stack):
+        # castLightAt only asks whether a cell blocks up to a row short of the radius, so the blockers of
+        # the inner (2r-1)^2 window and where the map's edges cut the window are the whole pattern
+        r = self.vision
+        rows = self.rows[:, None, None]
+        blocks = np.zeros(stack.shape[:3], dtype=bool)
+        for layer in range(stack.shape[-1]):
+            blocks |= (self.props[rows, stack[..., layer]] & BLOCKS_VISION) != 0
+        blocks[:, r, r] = False
+        inner = blocks[:, 1:-1, 1:-1].reshape(self.n, -1)
+        edges = np.stack([np.minimum(self.x, r), np.minimum(self.y, r), np.minimum(self.width - 1 - self.x, r),
+                          np.minimum(self.height - 1 - self.y, r)], axis=1).astype(np.uint8)
+        keys = np.ascontiguousarray(np.concatenate([edges, np.packbits(inner, axis=1)], axis=1))
+        keys = keys.view(np.dtype((np.void, keys.shape[1]))).ravel()
+        unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        ids = np.empty(len(unique), dtype=np.intp)
+        patterns = self.patterns
+        for u, key in enumerate(unique.tolist()):
+            mask = patterns.get(key)
+            if mask is None:
+                mask = patterns[key] = len(self.masks)
+                self.masks.append(self.cast(blocks[first[u]], edges[first[u]]))
+            ids[u] = mask
+        if len(self.mask_stack) != len(self.masks):
+            self.mask_stack = np.stack(self.masks)
+        return self.mask_stack[ids[inverse.ravel()]]
+
+    def cast(self, window, edges):
+        # shadowcasting on the part of the window inside the map
+        r = self.vision
+        left, up, right, down = [int(edge) for edge in edges]
+        x0 = r - left
+        y0 = r - up
+        mask = np.zeros_like(window)
+        cells = visible_cells(left + right + 1, up + down + 1, lambda x, y: window[y0 + y, x0 + x], left, up, r)
+        for (x, y) in cells:
+            mask[y0 + y, x0 + x] = True
+        return mask
+
+    def view(self):
+        # what every player sees as protocol.parse_cells folds it, as [n, 2r+1, 2r+1] windows centered on
+        # the player: visible, the group of each cell (the highest, INTERACTIVE_GROUP where a lever is), its
+        # win flag and the lever column (NOT_INTERACTIVE, INTERACT_UNKNOWN or the target the lever shows)
+        r = self.vision
+        cells, stack = self.around()
+        visible = self.see(stack)
+        groups = stack[..., 0]
+        for layer in range(1, stack.shape[-1]):
+            above = stack[..., layer]
+            groups = np.where((above != self.empty) & (above > groups), above, groups)
+        wins = (self.props[self.rows[:, None, None], groups] & WIN) != 0
+
+        # the levers go on a board of their own, later ones in a cell over earlier ones as parse_cells has it
+        games, slots = np.nonzero(self.lever_x >= 0)
+        board = np.zeros(self.groups.shape[:3], dtype=np.int16)
+        board[games, self.lever_y[games, slots] + r, self.lever_x[games, slots] + r] = np.where(
+            self.counter[games, slots] > 0, self.lever_target[games, slots], INTERACT_UNKNOWN)
+        levers = np.where(visible, board.reshape(-1).take(cells), NOT_INTERACTIVE)
+        lever = levers != NOT_INTERACTIVE
+        groups = np.where(lever, INTERACTIVE_GROUP, groups)
+        wins &= ~lever & visible
+        return visible, np.where(visible, groups, -2), wins, levers
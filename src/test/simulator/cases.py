@@ -0,0 +1,54 @@
+import glob
+import os
+import re
+
+from .tmx import load_map
+
+# the referee's test cases, config/test<N>.yaml: a title and testIn, the map path under
+# src/main/resources/maps and the turn limit the referee plays it with, one per line
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+CONFIG_DIR = os.path.join(ROOT, 'config')
+MAPS_DIR = os.path.join(ROOT, 'src', 'main', 'resources', 'maps')
+
+
+class TestCase(object):
+    def __init__(self, name, title, map_path, turn_limit):
+        self.name = name
+        self.title = title
+        self.map_path = map_path
+        self.turn_limit = turn_limit
+
+    def spec(self):
+        return load_map(self.map_path)
+
+
+def read_case(path):
+    # the files are flat enough that a few patterns do instead of a yaml parser
+    with open(path) as f:
+        text = f.read()
+    title = re.search(r"^\s+\d+: '(.*)'$", text, re.M)
+    test_in = re.search(r'^testIn: \|-\n((?:[ \t]+.*\n?)+)', text, re.M)
+    map_name, limit = [line.strip() for line in test_in.group(1).splitlines() if line.strip()][:2]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return TestCase(name, title.group(1) if title else name, os.path.join(MAPS_DIR, map_name), int(limit))
+
+
+def test_cases(config_dir=CONFIG_DIR):
+    # every test case, in test number order
+    paths = glob.glob(os.path.join(config_dir, 'test*.yaml'))
+    paths.sort(key=lambda path: int(re.sub(r'\D', '', os.path.basename(path)) or 0))
+    return [read_case(path) for path in paths]
+
+
+def case_for(target, config_dir=CONFIG_DIR):
+    # a test case by name ('test3'), by map ('map1', 'world1/map1.tmx') or for any .tmx file, which then
+    # plays with the map's own turn limit
+    for case in test_cases(config_dir):
+        map_name = os.path.splitext(os.path.basename(case.map_path))[0]
+        if target in (case.name, map_name, os.path.relpath(case.map_path, MAPS_DIR)):
+            return case
+    if os.path.exists(target):
+        name = os.path.splitext(os.path.basename(target))[0]
+        return TestCase(name, name, target, load_map(target).turn_limit)
+    raise ValueError(f'no test case or map {target}')
@@ -0,0 +1,128 @@
+import os
+import select
+import signal
+import subprocess
+import sys
+import time
+
+from .world import World
+
+# Referee.gameTurn over a pipe: the header 'W H turnLimit' once, then every turn 'N px py' and N lines
+# 'x y PROPS', and one line back. A turn that takes longer than the budget loses the game, as does a bot that
+# exits; the game is won the turn the player stands on a win point.
+
+# LINES is Referee.gameTurn's 'N px py' and N lines 'x y PROPS'. CELLS is the older protocol the bot in
+# maps/World1/Bot speaks: 'C px py' for C cells, each as 'x y n' and its n PROPS lines
+LINES = 'lines'
+CELLS = 'cells'
+
+TURN_MAX_TIME = 0.1
+# the JVM runner starts the bot while the referee loads, long before the first turn, so a fresh
+# interpreter's imports never count against it; here they would, the first turn gets this long instead
+FIRST_TURN_MAX_TIME = 1.0
+
+
+class GameResult(object):
+    def __init__(self, map_name, turn_limit):
+        self.map = map_name
+        self.turn_limit = turn_limit
+        self.won = False
+        self.turns = 0
+        self.deaths = 0
+        self.resets = 0
+        self.timeout = False
+        self.crashed = False
+        self.actions = []
+        # seconds from the end of a turn's observation to the bot's answer
+        self.latencies = []
+
+    def as_dict(self):
+        return {'map': self.map, 'won': self.won, 'turns': self.turns, 'turn_limit': self.turn_limit,
+                'deaths': self.deaths, 'resets': self.resets, 'timeout': self.timeout, 'crashed': self.crashed}
+
+
+class SubprocessAgent(object):
+    # a bot in its own process; anything with send(lines), receive(timeout) and close() can play
+    def __init__(self, command, stderr=subprocess.DEVNULL, env=None):
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr,
+                                     env=env, bufsize=0)
+        self.buffer = b''
+        # bytes, the most memory the process held at once; known once it is closed
+        self.peak_rss = None
+
+    def send(self, lines):
+        self.proc.stdin.write(('\n'.join(lines) + '\n').encode())
+
+    def receive(self, timeout):
+        # the next line, None once timeout seconds have passed without one
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        fd = self.proc.stdout.fileno()
+        while b'\n' not in self.buffer:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([fd], [], [], wait)
+            if not ready:
+                return None
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise EOFError('agent closed its output')
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return line.decode().strip()
+
+    def close(self):
+        # reaped with wait4 for the child's resource usage, which Popen would throw away; Popen.kill polls
+        # first and would reap it too
+        proc = self.proc
+        if proc.returncode is None:
+            os.kill(proc.pid, signal.SIGKILL)
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # kilobytes on Linux, bytes on macOS
+            self.peak_rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+        proc.stdin.close()
+        proc.stdout.close()
+
+
+def turn_lines(world, protocol=LINES):
+    # everything the agent is sent for one turn
+    if protocol == CELLS:
+        cells = world.visible()
+        lines = [f'{len(cells)} {world.x} {world.y}']
+        for (x, y), descs in cells:
+            lines.append(f'{x} {y} {len(descs)}')
+            lines.extend(descs)
+        return lines
+    lines = world.observation()
+    return [f'{len(lines)} {world.x} {world.y}'] + lines
+
+
+def play(spec, agent, turn_limit=None, turn_time=TURN_MAX_TIME, first_turn_time=FIRST_TURN_MAX_TIME, vision=4,
+         protocol=LINES):
+    # one game of the map on the agent; turn_time None waits for every answer however long it takes
+    world = World(spec, vision)
+    limit = turn_limit if turn_limit is not None else spec.turn_limit
+    result = GameResult(spec.name, limit)
+    try:
+        agent.send([f'{world.width} {world.height} {limit}'])
+        for turn in range(1, limit + 1):
+            agent.send(turn_lines(world, protocol))
+            started = time.perf_counter()
+            action = agent.receive(first_turn_time if turn == 1 and turn_time is not None else turn_time)
+            result.latencies.append(time.perf_counter() - started)
+            result.turns = turn
+            if action is None:
+                result.timeout = True
+                break
+            result.actions.append(action)
+            world.step(action)
+            if world.won():
+                result.won = True
+                break
+            world.after_turn()
+    except (EOFError, BrokenPipeError):
+        result.crashed = True
+    finally:
+        agent.close()
+    result.deaths = world.deaths
+    result.resets = world.resets
+    return result
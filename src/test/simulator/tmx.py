@@ -0,0 +1,98 @@
+import xml.etree.ElementTree as ElementTree
+
+# .tmx maps as mapParser.readMap reads them: the CSV data of the first tile layer (11 is a wall, everything
+# else floor) and the objects: one Start, Static objects of a group with its properties, and Interactive
+# levers that transform a group into another or toggle one of its properties.
+
+WALL_TILE = 11
+
+# map property names -> the names the simulator uses
+PROPERTY_NAMES = {'win': 'win', 'blocks vision': 'blocks_vision', 'unpassable': 'unpassable', 'kills': 'kills'}
+
+
+class Lever(object):
+    __slots__ = ('x', 'y', 'target', 'transform', 'toggle')
+
+    def __init__(self, x, y, target, transform=None, toggle=None):
+        self.x = x
+        self.y = y
+        self.target = target
+        # exactly one of: the group the target's cells turn into, the property it flips
+        self.transform = transform
+        self.toggle = toggle
+
+
+class Static(object):
+    __slots__ = ('x', 'y', 'group')
+
+    def __init__(self, x, y, group):
+        self.x = x
+        self.y = y
+        self.group = group
+
+
+class MapSpec(object):
+    def __init__(self, name, width, height, turn_limit):
+        self.name = name
+        self.width = width
+        self.height = height
+        # the map's own 'Turn Limit', the referee takes the one of its test case instead
+        self.turn_limit = turn_limit
+        self.walls = []
+        self.spawn = (-1, -1)
+        # group -> property names, as declared by the first object of the group; later objects of the group
+        # get the same ones whatever they declare
+        self.templates = {}
+        # statics and levers in declaration order, which is also their order inside a cell
+        self.objects = []
+
+
+def properties(obj):
+    return [(prop.get('name'), prop.get('value')) for prop in obj.iter('property')]
+
+
+def load_map(path):
+    root = ElementTree.parse(path).getroot()
+    width = int(root.get('width'))
+    height = int(root.get('height'))
+    tile = int(root.get('tilewidth'))
+
+    turn_limit = 0
+    for prop in root.find('properties') or []:
+        if prop.get('name') == 'Turn Limit':
+            turn_limit = int(prop.get('value'))
+    spec = MapSpec(path, width, height, turn_limit)
+
+    rows = [row for row in root.find('layer').find('data').text.strip().split('\n') if row.strip()]
+    for y, row in enumerate(rows):
+        for x, value in enumerate(v for v in row.split(',') if v.strip()):
+            if int(value) == WALL_TILE:
+                spec.walls.append((x, y))
+
+    for obj in root.iter('object'):
+        kind = obj.get('type')
+        # objects are anchored at their bottom left corner
+        x = int(round(float(obj.get('x')) / tile))
+        y = int(round(float(obj.get('y')) / tile)) - 1
+        props = properties(obj)
+        if kind == 'Start':
+            spec.spawn = (x, y)
+        elif kind == 'Static':
+            group = int(props[0][1])
+            if group not in spec.templates and group > 1:
+                names = [name for name in props[1][1].strip().split(', ') if name]
+                for name in names:
+                    if name not in PROPERTY_NAMES:
+                        raise ValueError(f'Property {name} is not implemented')
+                spec.templates[group] = frozenset(PROPERTY_NAMES[name] for name in names)
+            spec.objects.append(Static(x, y, group))
+        elif kind == 'Interactive':
+            target = int(props[1][1])
+            name, value = props[2]
+            if name == 'Transform onto':
+                spec.objects.append(Lever(x, y, target, transform=int(value)))
+            elif name == 'toggle property':
+                if value not in PROPERTY_NAMES:
+                    raise ValueError(f'Interaction {value} is not implemented')
+                spec.objects.append(Lever(x, y, target, toggle=PROPERTY_NAMES[value]))
+    return spec
@@ -0,0 +1,49 @@
+# recursive shadowcasting, line for line World.getVisibleBlocks / castLightAt: eight octants cast from the
+# player, cells further than the radius in manhattan distance are not seen, and cells come out in the order
+# they were first seen, which is the order the referee reports them in
+
+
+def visible_cells(width, height, blocks_vision, sx, sy, radius):
+    # blocks_vision(x, y) -> bool
+    visible = {(sx, sy): True}
+    for dy in (-1, 1):
+        for dx in (-1, 1):
+            cast_light(width, height, blocks_vision, sx, sy, radius, visible, 1, 1.0, 0.0, 0, dx, dy, 0)
+            cast_light(width, height, blocks_vision, sx, sy, radius, visible, 1, 1.0, 0.0, dx, 0, 0, dy)
+    return list(visible)
+
+
+def cast_light(width, height, blocks_vision, sx, sy, radius, visible, row, start, end, xx, xy, yx, yy):
+    if start < end:
+        return
+    new_start = 0.0
+    is_visible = True
+    for distance in range(row, radius + 1):
+        if not is_visible:
+            break
+        dy = -distance
+        for dx in range(-distance, 1):
+            cx = sx + dx * xx + dy * xy
+            cy = sy + dx * yx + dy * yy
+            left_slope = (dx - 0.5) / (dy + 0.5)
+            right_slope = (dx + 0.5) / (dy - 0.5)
+
+            if not (0 <= cx < width and 0 <= cy < height) or start < right_slope:
+                continue
+            elif end > left_slope:
+                break
+
+            if abs(dx) + abs(dy) <= radius:
+                visible[(cx, cy)] = True
+
+            if not is_visible:
+                if blocks_vision(cx, cy):
+                    new_start = right_slope
+                    continue
+                is_visible = True
+                start = new_start
+            elif blocks_vision(cx, cy) and distance < radius:
+                is_visible = False
+                cast_light(width, height, blocks_vision, sx, sy, radius, visible, distance + 1, start, left_slope,
+                           xx, xy, yx, yy)
+                new_start = right_slope
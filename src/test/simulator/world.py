@@ -0,0 +1,160 @@
+from .tmx import Lever, Static
+from .vision import visible_cells
+
+# The rules of maps/World1/rules description.txt as the Kotlin engine plays them. A cell holds a stack of
+# entities: the floor, then whatever the map put there in declaration order. Moving onto a cell with an
+# unpassable entity does nothing, moving onto one that kills kills; PASS never steps onto the player's own
+# cell again. USE works every lever under the player: a transform lever replaces each transmutable entity
+# of the target group with a fresh one of the new group, a toggle lever flips a property on every entity of
+# the group and on the group's template, so entities built later have it flipped too. A death or a RESET
+# builds the level again from the map, levers and templates included; the turn count goes on.
+
+FLOOR = 0
+WALL = 1
+# what a cell holding a lever counts as when the referee picks which of its lines to send
+INTERACTIVE_GROUP = 9999
+
+MOVES = {'LEFT': (-1, 0), 'RIGHT': (1, 0), 'UP': (0, -1), 'DOWN': (0, 1)}
+RESETS = ('RE', 'RESET')
+
+
+class Entity(object):
+    __slots__ = ('tid', 'props', 'transmutable', 'lever', 'counter')
+
+    def __init__(self, tid, props, transmutable=False, lever=None):
+        # tid is the entity's group, None for levers
+        self.tid = tid
+        self.props = set(props)
+        self.transmutable = transmutable
+        self.lever = lever
+        # times the lever was used since the level was built, its target shows from the first
+        self.counter = 0
+
+    def describe(self):
+        parts = []
+        if self.tid is not None:
+            parts.append(f'OBJECT_TYPE:{self.tid}')
+        if 'win' in self.props:
+            parts.append('WIN_POINT')
+        if self.lever is not None:
+            parts.append('INTERACT:?' if self.counter == 0 else f'INTERACT:{self.lever.target}')
+        return ','.join(parts)
+
+
+class World(object):
+    def __init__(self, spec, vision=4):
+        self.spec = spec
+        self.width = spec.width
+        self.height = spec.height
+        self.vision = vision
+        self.deaths = 0
+        self.resets = 0
+        self.reset()
+
+    def reset(self):
+        spec = self.spec
+        # group -> [properties, transmutable]; floor and wall are built in and cannot be transformed
+        self.templates = {FLOOR: [set(), False], WALL: [{'unpassable', 'blocks_vision'}, False]}
+        for group, props in spec.templates.items():
+            self.templates[group] = [set(props), True]
+
+        self.cells = [[self.build(FLOOR)] for _ in range(self.width * self.height)]
+        for (x, y) in spec.walls:
+            self.cells[y * self.width + x].append(self.build(WALL))
+        for obj in spec.objects:
+            if isinstance(obj, Static):
+                self.cells[obj.y * self.width + obj.x].append(self.build(obj.group))
+            elif isinstance(obj, Lever):
+                self.cells[obj.y * self.width + obj.x].append(Entity(None, (), lever=obj))
+        self.x, self.y = spec.spawn
+        self.alive = True
+
+    def build(self, group):
+        props, transmutable = self.templates[group]
+        return Entity(group, props, transmutable)
+
+    def at(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y * self.width + x]
+        return ()
+
+    def blocks_vision(self, x, y):
+        return any('blocks_vision' in e.props for e in self.cells[y * self.width + x])
+
+    def won(self):
+        return self.alive and any('win' in e.props for e in self.at(self.x, self.y))
+
+    def step(self, action):
+        # anything that is not a command is a PASS, like Engine.update
+        if action in RESETS:
+            self.resets += 1
+            self.reset()
+            return
+        if action in MOVES:
+            dx, dy = MOVES[action]
+            tx = self.x + dx
+            ty = self.y + dy
+            if not (0 <= tx < self.width and 0 <= ty < self.height):
+                return
+            target = self.at(tx, ty)
+            if any('unpassable' in e.props for e in target):
+                return
+            self.x = tx
+            self.y = ty
+            if any('kills' in e.props for e in target):
+                self.alive = False
+        elif action == 'USE':
+            for e in list(self.at(self.x, self.y)):
+                if e.lever is not None:
+                    e.counter += 1
+                    self.interact(e.lever)
+
+    def interact(self, lever):
+        if lever.transform is not None:
+            if lever.transform not in self.templates:
+                return
+            for cell in self.cells:
+                for e in list(cell):
+                    if e.tid == lever.target and e.transmutable:
+                        cell.remove(e)
+                        cell.append(self.build(lever.transform))
+        else:
+            prop = lever.toggle
+            for cell in self.cells:
+                for e in cell:
+                    if e.tid == lever.target:
+                        e.props ^= {prop}
+            if lever.target in self.templates:
+                self.templates[lever.target][0] ^= {prop}
+
+    def after_turn(self):
+        # Referee.gameTurn: a dead player comes back in a level built from scratch
+        if not self.alive:
+            self.deaths += 1
+            self.reset()
+
+    def observation(self):
+        # the lines of one turn after the 'N px py' header
+        return [f'{x} {y} {desc}' for (x, y), descs in self.visible() for desc in descs]
+
+    def visible(self):
+        # ((x, y), descriptions) of every cell in sight, in the order the referee reports them. A cell's
+        # descriptions come in stack order; a cell holding anything above the floor leaves the floor out
+        cells = []
+        for (x, y) in visible_cells(self.width, self.height, self.blocks_vision, self.x, self.y, self.vision):
+            full = []
+            trimmed = []
+            highest = 0
+            for e in self.cells[y * self.width + x]:
+                desc = e.describe()
+                if e.tid is not None and e.tid > highest:
+                    highest = e.tid
+                if e.lever is not None:
+                    highest = INTERACTIVE_GROUP
+                if desc:
+                    full.append(desc)
+                    if e.tid != FLOOR:
+                        trimmed.append(desc)
+            if full:
+                cells.append(((x, y), trimmed if highest > 0 else full))
+        return cells
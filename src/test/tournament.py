@@ -0,0 +1,341 @@
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from simulator import CELLS, LINES, SubprocessAgent, case_for, play, test_cases
+
+# plays every (bot, map, turn limit, config) job through the headless simulator on all cores and writes one
+# JSON line per game as it finishes, then a side by side table per map:
+#   python tournament.py [map ...] [--bot current] [--bot world1] [--compare] [--limit N ...]
+#                        [--config name:KEY=VAL,KEY=VAL ...] [--out results.jsonl]
+# a bot is path[:protocol]. lines and cells are the two referee protocols spoken by a subprocess, inprocess
+# imports the script into the worker, with its own sibling modules, and feeds it the same lines; only
+# scripts with bot.py's observe() can do that, the bot in maps/World1/Bot is one top level loop. A config is
+# environment variables for the game, KEKE_SEARCH=bitboard or PYTHONHASHSEED=1; an in-process bot reads them
+# when it builds its Bot, anything read at import keeps the worker's first value.
+# A game that hangs is cut off after --game-timeout seconds and a worker that dies takes its game along; both
+# come back as results, the rest of the tournament goes on.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BOTS = {
+    'current': os.path.join(HERE, 'bot.py') + ':' + LINES,
+    'world1': os.path.normpath(os.path.join(HERE, '..', '..', 'maps', 'World1', 'Bot', 'bot.py')) + ':' + CELLS,
+}
+INPROCESS = 'inprocess'
+PROTOCOLS = (LINES, CELLS, INPROCESS)
+GAME_TIMEOUT = 600
+
+
+class GameTimeout(Exception):
+    pass
+
+
+class Job(object):
+    def __init__(self, bot, path, protocol, case, limit, config_name, config, vision, turn_time):
+        self.bot = bot
+        self.path = path
+        self.protocol = protocol
+        self.case = case
+        self.limit = limit
+        self.config_name = config_name
+        self.config = config
+        self.vision = vision
+        self.turn_time = turn_time
+        # 1 once the game is played again after its pool broke
+        self.attempt = 0
+
+
+def parse_bot(spec):
+    # (label, path, protocol) from 'current', 'world1' or path[:protocol]
+    label = spec
+    spec = BOTS.get(spec, spec)
+    path, protocol = spec, LINES
+    head, sep, tail = spec.rpartition(':')
+    if sep and tail in PROTOCOLS:
+        path, protocol = head, tail
+    if not os.path.exists(path):
+        raise ValueError(f'no bot {path}')
+    if label == spec:
+        label = os.path.relpath(path, HERE) + ('' if protocol == LINES else ':' + protocol)
+    return label, os.path.abspath(path), protocol
+
+
+def parse_config(spec):
+    # (name, {KEY: VAL}) from name:KEY=VAL,KEY=VAL or just KEY=VAL,...
+    name, sep, pairs = spec.partition(':')
+    if not sep:
+        name, pairs = spec, spec
+    config = {}
+    for pair in filter(None, pairs.split(',')):
+        key, sep, value = pair.partition('=')
+        if not sep:
+            raise ValueError(f'config {spec}: {pair} is not KEY=VAL')
+        config[key] = value
+    return name, config
+
+
+# in-process bots by path, loaded once per worker: the module and the sibling modules it imported
+MODULES = {}
+
+
+def sibling_names(directory):
+    return {name for name, ext in map(os.path.splitext, os.listdir(directory)) if ext == '.py'}
+
+
+def loaded_from(module, directory):
+    path = getattr(module, '__file__', None)
+    return path is not None and os.path.dirname(os.path.abspath(path)) == directory
+
+
+def load_bot(path):
+    # scripts of different trees import their siblings by the same names (protocol, grid, queries, ...), so
+    # before a script is loaded or plays, any sibling sys.modules holds from another directory is taken out
+    # and its own are put back; a lazy import then finds its own directory first on sys.path
+    directory = os.path.dirname(path)
+    names = sibling_names(directory)
+    for name in names:
+        if name in sys.modules and not loaded_from(sys.modules[name], directory):
+            del sys.modules[name]
+    if directory in sys.path:
+        sys.path.remove(directory)
+    sys.path.insert(0, directory)
+    if path in MODULES:
+        module, siblings = MODULES[path]
+        sys.modules.update(siblings)
+        return module
+    spec = importlib.util.spec_from_file_location('tournament_bot_%d' % len(MODULES), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    siblings = {name: sys.modules[name] for name in names if name in sys.modules}
+    strays = sorted(name for name, sibling in siblings.items() if not loaded_from(sibling, directory))
+    if strays:
+        raise ValueError(f'{path} imported {", ".join(strays)} from outside {directory}')
+    if not hasattr(module, 'observe'):
+        raise ValueError(f'{path} has no observe(), it only runs as a subprocess')
+    MODULES[path] = (module, siblings)
+    return module
+
+
+class InProcessAgent(object):
+    # the bot module in this process: the lines of a turn go through the bot's own protocol parser and the
+    # move is worked out when the referee asks for it, so the latency play() measures is the bot's
+    def __init__(self, module):
+        self.module = module
+        self.parse_cells = sys.modules['protocol'].parse_cells
+        self.header = None
+        self.obs = None
+        self.bot = None
+        self.peak_rss = None
+
+    def send(self, lines):
+        if self.header is None:
+            self.header = [int(i) for i in lines[0].split()]
+            return
+        received = time.monotonic()
+        _, sx, sy = [int(i) for i in lines[0].split()]
+        self.obs = self.parse_cells([line.encode() for line in lines[1:]], sx, sy)
+        self.obs.received = received
+
+    def receive(self, timeout):
+        started = time.monotonic()
+        w, h, limit = self.header
+        self.bot = self.module.observe(self.bot, self.obs, w, h, limit)
+        move = self.bot.make_move()
+        if timeout is not None and time.monotonic() - started > timeout:
+            return None
+        return move
+
+    def close(self):
+        self.bot = None
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def on_alarm(signum, frame):
+    raise GameTimeout()
+
+
+def run_job(job, game_timeout):
+    # one game in a pool worker; whatever goes wrong in the game comes back in the record
+    record = {'bot': job.bot, 'path': job.path, 'protocol': job.protocol, 'case': job.case.name,
+              'map': os.path.basename(job.case.map_path), 'limit': job.limit, 'config': job.config_name,
+              'env': job.config, 'vision': job.vision, 'attempt': job.attempt, 'worker': os.getpid(),
+              'won': False, 'turns': 0, 'deaths': 0, 'resets': 0, 'timeout': False, 'crashed': False,
+              'game_timeout': False, 'worker_crash': False, 'error': None}
+    saved = {key: os.environ.get(key) for key in job.config}
+    os.environ.update(job.config)
+    started = time.perf_counter()
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.alarm(game_timeout)
+    try:
+        # an in-process bot's log goes where a subprocess bot's does, nowhere
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stderr(devnull):
+            if job.protocol == INPROCESS:
+                agent = InProcessAgent(load_bot(job.path))
+                protocol = LINES
+            else:
+                agent = SubprocessAgent([sys.executable, job.path], env=dict(os.environ))
+                protocol = job.protocol
+            result = play(job.case.spec(), agent, turn_limit=job.limit, turn_time=job.turn_time,
+                          vision=job.vision, protocol=protocol)
+        latencies = sorted(result.latencies[1:])
+        record.update(won=result.won, turns=result.turns, deaths=result.deaths, resets=result.resets,
+                      timeout=result.timeout, crashed=result.crashed,
+                      p50_ms=round(percentile(latencies, 0.50) * 1000, 3),
+                      p99_ms=round(percentile(latencies, 0.99) * 1000, 3),
+                      max_ms=round(latencies[-1] * 1000 if latencies else 0.0, 3))
+    except GameTimeout:
+        record['game_timeout'] = True
+    except Exception as e:
+        record['crashed'] = True
+        record['error'] = f'{type(e).__name__}: {e}'
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    record['wall_s'] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def crash_record(job, error):
+    return {'bot': job.bot, 'path': job.path, 'protocol': job.protocol, 'case': job.case.name,
+            'map': os.path.basename(job.case.map_path), 'limit': job.limit, 'config': job.config_name,
+            'env': job.config, 'vision': job.vision, 'attempt': job.attempt, 'worker': None,
+            'won': False, 'turns': 0, 'deaths': 0, 'resets': 0, 'timeout': False, 'crashed': False,
+            'game_timeout': False, 'worker_crash': True, 'error': error}
+
+
+def run(jobs, out, workers, game_timeout, log=sys.stderr):
+    # plays the jobs, writing each record the moment its game ends. A worker that dies breaks the whole
+    # pool and fails every game still in it, not just its own, so those games are played again each in a
+    # pool of its own, workers of them at a time; a game that breaks its own pool is the worker crash
+    records = []
+
+    def write(record):
+        out.write(json.dumps(record, sort_keys=True) + '\n')
+        out.flush()
+        records.append(record)
+        print(f"[{len(records)}/{len(jobs)}] {record['bot']:24} {record['case']:7} {outcome(record):12} "
+              f"{record['turns']:4}/{record['limit']:<4} {record['config']}", file=log)
+
+    broken = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job, game_timeout): job for job in jobs}
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job = futures.pop(future)
+                try:
+                    write(future.result())
+                except BrokenProcessPool:
+                    broken.append(job)
+
+    if broken:
+        print(f'worker pool broke, playing {len(broken)} games again one per pool', file=log)
+    futures = {}
+    while broken or futures:
+        while broken and len(futures) < workers:
+            job = broken.pop(0)
+            job.attempt += 1
+            pool = ProcessPoolExecutor(max_workers=1)
+            futures[pool.submit(run_job, job, game_timeout)] = (job, pool)
+        finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in finished:
+            job, pool = futures.pop(future)
+            try:
+                write(future.result())
+            except BrokenProcessPool as e:
+                write(crash_record(job, f'{type(e).__name__}: {e}'))
+            pool.shutdown()
+    return records
+
+
+def outcome(record):
+    for key in ('won', 'worker_crash', 'game_timeout', 'timeout', 'crashed'):
+        if record[key]:
+            return key
+    return 'lost'
+
+
+def table(records, bots, out=sys.stdout):
+    # one row per map, limit, config and vision, a column per bot: won/games, mean turns of the won games
+    # and the median of the games' p50 latencies
+    rows = {}
+    for record in records:
+        key = (record['case'], record['limit'], record['config'], record['vision'])
+        rows.setdefault(key, {}).setdefault(record['bot'], []).append(record)
+    width = max([24] + [len(bot) for bot in bots])
+    print(f"{'case':7} {'limit':>5} {'config':10} {'vision':>6}  " + '  '.join(f'{bot:>{width}}' for bot in bots),
+          file=out)
+    order = {case.name: i for i, case in enumerate(test_cases())}
+    for key in sorted(rows, key=lambda key: (order.get(key[0], len(order)), key[0], key[1], key[2], key[3])):
+        cells = []
+        for bot in bots:
+            games = rows[key].get(bot, [])
+            won = [game for game in games if game['won']]
+            turns = sum(game['turns'] for game in won) / len(won) if won else 0
+            p50 = sorted(game.get('p50_ms', 0.0) for game in games)
+            cells.append(f"{len(won)}/{len(games)} {turns:6.1f}t {percentile(p50, 0.5):6.2f}ms" if games else '-')
+        case, limit, config, vision = key
+        print(f'{case:7} {limit:5} {config:10} {vision:6}  ' + '  '.join(f'{cell:>{width}}' for cell in cells),
+              file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='tournament.py')
+    parser.add_argument('cases', nargs='*', help='test cases, maps or .tmx files; all test cases if none')
+    parser.add_argument('--bot', action='append', default=[], help='current, world1 or path[:protocol]')
+    parser.add_argument('--compare', action='store_true', help='--bot current --bot world1')
+    parser.add_argument('--limit', type=int, action='append', default=[], help="instead of the test case's")
+    parser.add_argument('--config', action='append', default=[], help='name:KEY=VAL,...')
+    parser.add_argument('--vision', type=int, action='append', default=[])
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--no-timeout', action='store_true', help='wait for every answer')
+    parser.add_argument('--game-timeout', type=int, default=GAME_TIMEOUT, help='seconds a whole game may take')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--out', default='tournament.jsonl')
+    args = parser.parse_args()
+
+    bots = [parse_bot(spec) for spec in (args.bot or []) + (['current', 'world1'] if args.compare else [])]
+    if not bots:
+        bots = [parse_bot('current')]
+    cases = [case_for(target) for target in args.cases] if args.cases else test_cases()
+    configs = [parse_config(spec) for spec in args.config] or [('default', {})]
+    turn_time = None if args.no_timeout else 0.1
+
+    # every bot gets the same games in the same order, interleaved so the slow maps spread over the pool
+    jobs = []
+    for case in cases:
+        for limit in args.limit or [case.turn_limit]:
+            for name, config in configs:
+                for vision in args.vision or [4]:
+                    for _ in range(args.repeat):
+                        for label, path, protocol in bots:
+                            jobs.append(Job(label, path, protocol, case, limit, name, config, vision, turn_time))
+
+    print(f'{len(jobs)} games on {args.workers} workers, results in {args.out}', file=sys.stderr)
+    started = time.perf_counter()
+    with open(args.out, 'w') as out:
+        records = run(jobs, out, args.workers, args.game_timeout)
+    print(f'{time.perf_counter() - started:.1f}s', file=sys.stderr)
+    table(records, [label for label, _, _ in bots])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import os
+import time
+import zlib
+
+# KEKE_TRANSCRIPT=<path>  record the game there, {pid} and {time} in the path are filled in
+#
+# A transcript is MAGIC and then one zlib stream of records, each a kind byte, a varint length and that many
+# bytes: INPUT is every line read for a turn (the header rides along with the first), ANSWER the line we
+# print, written just before it. The stream is sync flushed after every record, the referee kills us without
+# warning, the moment the game is over too, so a transcript cut anywhere still reads up to its last record
+# and the input of a turn that was never answered is there to replay. One flush per record costs a few
+# bytes; the rest of a turn is mostly the lines of the turn before, which zlib's window has at hand.
+TRANSCRIPT_ENV = 'KEKE_TRANSCRIPT'
+
+MAGIC = b'KEKE-TRANSCRIPT 1\n'
+INPUT = ord('I')
+ANSWER = ord('A')
+
+
+def varint(n):
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+class Recorder(object):
+    # the reader appends what it takes to lines, write_input and write_answer turn them into records
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.compressor = zlib.compressobj(6)
+        self.lines = []
+
+    def record(self, kind, payload):
+        compressor = self.compressor
+        chunk = compressor.compress(bytes((kind,)) + varint(len(payload)) + payload)
+        self.file.write(chunk + compressor.flush(zlib.Z_SYNC_FLUSH))
+        self.file.flush()
+
+    def write_input(self):
+        self.record(INPUT, b'\n'.join(self.lines) + b'\n')
+        self.lines.clear()
+
+    def write_answer(self, answer):
+        self.record(ANSWER, answer.encode())
+
+    def close(self):
+        self.file.write(self.compressor.flush())
+        self.file.close()
+
+
+def recorder_from_env():
+    path = os.environ.get(TRANSCRIPT_ENV)
+    if not path:
+        return None
+    return Recorder(path.format(pid=os.getpid(), time=time.strftime('%Y%m%d-%H%M%S')))
+
+
+def read(path):
+    # [(kind, payload)] of every whole record
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f'{path} is not a transcript')
+    # a cut stream decompresses up to the cut and leaves the rest unused
+    data = zlib.decompressobj().decompress(data[len(MAGIC):])
+    records = []
+    pos = 0
+    while pos < len(data):
+        kind = data[pos]
+        n = 0
+        shift = 0
+        pos += 1
+        while pos < len(data):
+            byte = data[pos]
+            pos += 1
+            n |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        else:
+            break
+        if pos + n > len(data):
+            break
+        records.append((kind, data[pos:pos + n]))
+        pos += n
+    return records
+
+
+def turns(path):
+    # (input, answer) per turn, answer None for a turn the bot never answered
+    out = []
+    for kind, payload in read(path):
+        if kind == INPUT:
+            out.append([payload, None])
+        elif kind == ANSWER and out:
+            out[-1][1] = payload.decode()
+    return [tuple(turn) for turn in out]
@@ -0,0 +1,76 @@
+from model import ShiftType
+
+# A copy of everything a shift can touch: the board, the group properties and the undo log. The board is a
+# Grid snapshot, so taking a state costs nothing and restoring one costs the writes in between; the group
+# records and the undo log's shifts are copied, there are a few dozen at most, since the bot fills in and
+# rewrites the last shift as it learns what the lever did. A state is never written to, so any number of
+# them can be kept alive and restored in any order, until the board's history is forgotten past them.
+
+
+class WorldState(object):
+    __slots__ = ('board', 'groups', 'history', 'versions')
+
+    def __init__(self, board, groups, history, versions):
+        self.board = board
+        self.groups = groups
+        self.history = history
+        # the bot's board and group versions, which name exactly this board and these groups
+        self.versions = versions
+
+    def same_model(self, bot):
+        # whether the live model holds exactly this state's knowledge: the versions vouch for the board and
+        # the groups' pathing, the rest of what is known about the groups is compared
+        groups = bot.groups
+        if self.versions != (bot.board_version, bot.groups_version) or len(self.groups) != len(groups):
+            return False
+        for gid, props in self.groups.items():
+            if gid not in groups or groups[gid].packed() != props.packed():
+                return False
+        return True
+
+
+def copy_shift(shift):
+    record = shift.copy()
+    if record.stored_group is not None:
+        record.stored_group = record.stored_group.copy()
+    return record
+
+
+def capture(bot):
+    return WorldState(bot.board.snapshot(), {gid: props.copy() for gid, props in bot.groups.items()},
+                      tuple(copy_shift(shift) for shift in bot.shift_history),
+                      (bot.board_version, bot.groups_version))
+
+
+def install(bot, state):
+    bot.board.restore(state.board)
+    bot.groups = {gid: props.copy() for gid, props in state.groups.items()}
+    bot.shift_history = [copy_shift(shift) for shift in state.history]
+    bot.board_version, bot.groups_version = state.versions
+
+
+def mark(bot):
+    # where a lookahead returns to after trying shifts: the shifts it applies carry the group records they
+    # overwrote and the board's history the cells, so only positions are kept and going back costs what was
+    # tried
+    versions = (bot.board_version, bot.groups_version)
+    return bot.board.snapshot(), len(bot.groups), len(bot.shift_history), versions
+
+
+def rewind(bot, point):
+    board, count, depth, versions = point
+    groups = bot.groups
+    history = bot.shift_history
+    while len(history) > depth:
+        record = history.pop()
+        if record.type != ShiftType.TRANSFORM:
+            groups[record.target_group] = record.stored_group
+    # groups are added at the end, apply_shift adds an unknown target
+    while len(groups) > count:
+        groups.popitem()
+    bot.board.restore(board)
+    bot.board_version, bot.groups_version = versions
+
+
+def pathing(groups):
+    return {gid: group.pathing() for gid, group in groups.items()}